@@ -0,0 +1,46 @@
+import time
+from email.utils import formatdate
+
+
+def gallery_fixture(images: int) -> str:
+    items = "".join(
+        f"<div class='gallery-item'><a href='https://www.ilpost.it/photo/{i}.jpg'>"
+        f"<img data-src='https://www.ilpost.it/photo/{i}-thumb.jpg.webp'/></a></div>"
+        for i in range(images)
+    )
+    return (
+        "<article><div class='sottit'>Subtitle</div><div id='singleBody'>"
+        f"<p>Intro</p><div class='gallery'>{items}</div><p>Outro</p></div></article>"
+    )
+
+
+def live_blog_fixture(updates: int) -> str:
+    update = (
+        "<p>Update text with <a href='https://www.ilpost.it'>a link</a>.</p>"
+        "<blockquote>A quote</blockquote>"
+        "<div id='attachment_1'><img data-src='https://www.ilpost.it/img.jpeg.webp'/>Caption</div>"
+        "<div class='video-container'><div class='rll-youtube-player' data-src='https://youtu.be/abc'></div></div>"
+        "<div class='ilpost_datawrapper' data-url='https://datawrapper.dwcdn.net/abc/'></div>"
+        "<p><iframe src='https://example.com/embed'></iframe></p>"
+    )
+    return (
+        "<article><div id='singleBody'>"
+        "<div class='live-center-embed' data-src='https://live.ilpost.it/abc'></div>"
+        f"{update * updates}</div></article>"
+    )
+
+
+def feed_fixture(base_url: str, entries: int) -> str:
+    """An ilpost-like feed whose entries point to the upstream article pages."""
+    now = time.time()
+    items = "".join(
+        f"<item><title>Article {i}</title><link>{base_url}/article/{i}</link>"
+        f"<category>Mondo</category><description>Summary {i}</description>"
+        f"<pubDate>{formatdate(now - i * 60)}</pubDate></item>"
+        for i in range(entries)
+    )
+    return (
+        "<?xml version='1.0' encoding='UTF-8'?><rss version='2.0'><channel>"
+        f"<title>Load test</title><link>{base_url}</link><description>Stand-in upstream</description>"
+        f"<language>it-IT</language>{items}</channel></rss>"
+    )
@@ -0,0 +1,251 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import httpx
+import psutil
+
+from benchmarks.fixtures import feed_fixture, gallery_fixture, live_blog_fixture
+
+# Latency histogram upper bounds, in milliseconds
+BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf")]
+
+
+class Upstream:
+    """Serves the feed and its articles from a background thread."""
+
+    def __init__(self, entries: int, port: int = 0):
+        pages: Dict[str, bytes] = {}
+        server = ThreadingHTTPServer(("127.0.0.1", port), self._handler(pages))
+        self.server = server
+        self.url = f"http://127.0.0.1:{server.server_address[1]}"
+        pages["/feed/"] = feed_fixture(self.url, entries).encode("utf-8")
+        for i in range(entries):
+            article = gallery_fixture(50) if i % 2 else live_blog_fixture(50)
+            pages[f"/article/{i}"] = f"<html><body>{article}</body></html>".encode(
+                "utf-8"
+            )
+        self.thread = threading.Thread(target=server.serve_forever, daemon=True)
+
+    @staticmethod
+    def _handler(pages: Dict[str, bytes]):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                page = pages.get(self.path)
+                self.send_response(200 if page else 404)
+                self.end_headers()
+                self.wfile.write(page or b"")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+
+
+class ResourceSampler:
+    """Samples the RSS and the browser processes of a process tree, keeping the peaks."""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_browsers = 0
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            rss, browsers = 0, 0
+            try:
+                processes = [self.process] + self.process.children(recursive=True)
+            except psutil.NoSuchProcess:
+                return
+            for process in processes:
+                try:
+                    rss += process.memory_info().rss
+                    if "chrome" in process.name():
+                        browsers += 1
+                except psutil.NoSuchProcess:
+                    pass
+            self.peak_rss = max(self.peak_rss, rss)
+            self.peak_browsers = max(self.peak_browsers, browsers)
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> Dict[str, int]:
+        self._stop.set()
+        self.thread.join()
+        return {
+            "peak_rss_bytes": self.peak_rss,
+            "peak_browser_processes": self.peak_browsers,
+        }
+
+
+def start_app(port: int, upstream: Upstream, db: str, workers: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        RSS_PARSER_BROWSER=os.environ.get("RSS_PARSER_BROWSER", "http"),
+        RSS_PARSER_CACHE_BACKEND="sqlite",
+        RSS_PARSER_SQLITE_DB=db,
+        RSS_PARSER_FEEDS="ilpost",
+        RSS_PARSER_FEED_URLS=f"ilpost={upstream.url}/feed/",
+        # the stand-in upstream doesn't need any politeness
+        RSS_PARSER_DOMAIN_LIMITS=os.environ.get(
+            "RSS_PARSER_DOMAIN_LIMITS", f"{upstream.url[7:]}=1000:100000"
+        ),
+    )
+    app = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+            "rss_parser.api:app",
+        ],
+        env=env,
+        # the project root, so that rss_parser can be imported even if not installed
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    # wait for it to accept connections
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/docs", timeout=1)
+            return app
+        except httpx.TransportError:
+            time.sleep(0.1)
+    app.kill()
+    raise Exception("The app did not start")
+
+
+def summarize(latencies: List[float], errors: int, duration: float) -> Dict:
+    latencies = sorted(latencies)
+    total = len(latencies) + errors
+
+    def percentile(p: float) -> Optional[float]:
+        if not latencies:
+            return None
+        return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)], 2)
+
+    histogram = {}
+    index = 0
+    for bound in BUCKETS:
+        count = 0
+        while index < len(latencies) and latencies[index] <= bound:
+            count += 1
+            index += 1
+        histogram[f"<={bound}ms" if bound != float("inf") else "inf"] = count
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0,
+        "throughput_rps": round(total / duration, 2),
+        "p50_ms": percentile(0.5),
+        "p90_ms": percentile(0.9),
+        "p99_ms": percentile(0.99),
+        "histogram": histogram,
+    }
+
+
+async def run_level(
+    base_url: str, paths: Dict[str, List[str]], concurrency: int, duration: float
+) -> Dict:
+    """Run concurrency pollers for duration seconds, each one cycling over every endpoint."""
+    latencies: Dict[str, List[float]] = {endpoint: [] for endpoint in paths}
+    errors: Dict[str, int] = {endpoint: 0 for endpoint in paths}
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+
+        async def poller(n: int) -> None:
+            i = n
+            while time.monotonic() < deadline:
+                for endpoint, endpoint_paths in paths.items():
+                    path = endpoint_paths[i % len(endpoint_paths)]
+                    start = time.perf_counter()
+                    try:
+                        response = await client.get(path)
+                        if response.status_code != 200:
+                            errors[endpoint] += 1
+                            continue
+                    except httpx.HTTPError:
+                        errors[endpoint] += 1
+                        continue
+                    latencies[endpoint].append((time.perf_counter() - start) * 1000)
+                i += 1
+
+        await asyncio.gather(*(poller(n) for n in range(concurrency)))
+
+    return {
+        endpoint: summarize(latencies[endpoint], errors[endpoint], duration)
+        for endpoint in paths
+    }
+
+
+def run(
+    concurrency: List[int],
+    duration: float = 10,
+    entries: int = 20,
+    port: int = 8765,
+    workers: int = 1,
+) -> Dict:
+    upstream = Upstream(entries)
+    upstream.start()
+    db = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+    app = start_app(port, upstream, db, workers)
+    sampler = ResourceSampler(app.pid)
+    sampler.start()
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        # warm up the cache, so that /cached has something to serve
+        httpx.get(f"{base_url}/parse/ilpost.rss", timeout=600)
+        articles = [f"{upstream.url}/article/{i}" for i in range(entries)]
+        paths = {
+            "parse": ["/parse/ilpost.rss"],
+            "cached": [f"/cached/ilpost/?id_={url}" for url in articles],
+            "preview": [f"/preview/ilpost/?id_={url}" for url in articles],
+        }
+        levels = {}
+        for level in concurrency:
+            levels[str(level)] = asyncio.run(
+                run_level(base_url, paths, level, duration)
+            )
+    finally:
+        resources = sampler.stop()
+        app.terminate()
+        app.wait()
+        upstream.stop()
+        os.remove(db)
+    return {
+        "duration_s": duration,
+        "workers": workers,
+        "browser": os.environ.get("RSS_PARSER_BROWSER", "http"),
+        "levels": levels,
+        **resources,
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(run([int(c) for c in sys.argv[1:]] or [50]), indent=2))
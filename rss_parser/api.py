@@ -1,27 +1,44 @@
-from typing import Optional
+from typing import Optional, Type
 
-from fastapi import BackgroundTasks, FastAPI, Response, HTTPException
+from fastapi import BackgroundTasks, FastAPI, Request, Response, HTTPException
 from fastapi.responses import HTMLResponse
 
-from rss_parser.logger import cache_log, parser_log
-from rss_parser.parser.ilpost import IlPostParser
-from rss_parser.parser.nasa_iotd import NasaIOTDParser
-from rss_parser.selenium import setup_selenium, Browser
+from rss_parser import config
+from rss_parser.cache.backend import CACHED
+from rss_parser.cache.failures import FailureCache
+from rss_parser.json_feed import (
+    decode_cursor,
+    dumps,
+    encode_cursor,
+    to_json_feed,
+)
+from rss_parser.logger import parser_log
+from rss_parser.parser import Parser
+from rss_parser.parser.registry import ParserRegistry
+from rss_parser.scheduler import scheduler
+from rss_parser.selenium import setup_selenium, new_browser
+from rss_parser.watchdog import watchdog
 
 app = FastAPI()
 
 # Prepare selenium
-setup_selenium()
+if config.BROWSER == "chrome":
+    setup_selenium()
 
-# Register parsers
-active_parsers = [NasaIOTDParser, IlPostParser]
-parser_log(f"activated: {', '.join(map(lambda x: x.name, active_parsers))}")
+# Register parsers, they will be loaded (and their cache initialised) on first use
+parsers = ParserRegistry.from_config()
+parser_log(f"activated: {', '.join(parsers.names())}")
 
-# Init the cache
-cache_log("Init...")
-for parser in active_parsers:
-    parser.cache.init()
-cache_log("Ready")
+# Shared by every parser
+FailureCache.init()
+
+
+def get_parser(feed_id: str) -> Type[Parser]:
+    parser = parsers.get(feed_id)
+    if parser is None:
+        # there were no match with the activated parsers
+        raise HTTPException(status_code=404, detail="Feed not found")
+    return parser
 
 
 @app.get("/parse/{feed_id}.rss")
@@ -29,64 +46,128 @@ def parse(
     feed_id: str, background_tasks: BackgroundTasks, limit: Optional[int] = None
 ) -> Response:
     """TODO"""
-
-    for active_parser in active_parsers:
-        if feed_id == active_parser.name:
-            # background tasks will be executed after returning the response
-            background_tasks.add_task(active_parser.cache.prune)
-            # use the default limit if it was not specified or if it was invalid
-            if not limit or limit > active_parser.default_limit or limit < 1:
-                limit = active_parser.default_limit
-            # return the parsed feed
-            return Response(
-                content=active_parser.get_xml_feed(limit), media_type="application/xml"
+    active_parser = get_parser(feed_id)
+    # background tasks will be executed after returning the response
+    background_tasks.add_task(active_parser.cache.prune)
+    background_tasks.add_task(active_parser.captures.prune)
+    background_tasks.add_task(FailureCache.prune)
+    # use the default limit if it was not specified or if it was invalid
+    if not limit or limit > active_parser.default_limit or limit < 1:
+        limit = active_parser.default_limit
+    # return the parsed feed
+    return Response(
+        content=active_parser.get_xml_feed(limit), media_type="application/xml"
+    )
+
+
+@app.get("/items/{feed_id}")
+def items(
+    feed_id: str, request: Request, since: Optional[str] = None, limit: int = 50
+) -> Response:
+    """Items cached (or refreshed) after since, in the order they were cached, as a JSON Feed. It never scrapes
+    anything.
+
+    since can be a UTC epoch, the '_cursor' of the previous response (which keeps working after its item is
+    pruned) or the id of a cached item."""
+    active_parser = get_parser(feed_id)
+    limit = min(max(limit, 1), 500)
+    since_key, after_id = 0, None
+    if since and since.isdigit():
+        since_key = int(since) * 1000000 - 1
+    elif since and decode_cursor(since):
+        since_key, after_id = decode_cursor(since)
+    elif since:
+        since_item = active_parser.cache.recover_from_cache(since)
+        if not since_item:
+            raise HTTPException(
+                status_code=404,
+                detail="Item not found in cache, use a timestamp or a cursor instead",
             )
-
-    # If we got here we there were no match with the activated parsed
-    raise HTTPException(status_code=404, detail="Feed not found")
+        since_key, after_id = int(since_item[CACHED]), since
+    rows = active_parser.cache.recover_page_from_cache(since_key, after_id, limit)
+    if rows:
+        cursor = encode_cursor(int(rows[-1][CACHED]), rows[-1]["id"])
+    elif after_id is not None:
+        cursor = encode_cursor(since_key, after_id)
+    else:
+        cursor = since
+    next_url = None
+    if len(rows) == limit:
+        next_url = str(request.url.include_query_params(since=cursor))
+    return Response(
+        content=dumps(to_json_feed(active_parser, rows, cursor, next_url)),
+        media_type="application/feed+json",
+    )
 
 
 @app.get("/cached/{feed_id}/", response_class=HTMLResponse)
 def cached(feed_id: str, id_: str):
     """Used to quickly preview an already cached item."""
-    for active_parser in active_parsers:
-        if feed_id == active_parser.name:
-            cached_item = active_parser.cache.recover_from_cache(id_=id_)
-            if cached_item:
-                return f"""
-                <html><head></head><body>{ cached_item["description"] }</body></html>
-                """
-            # If we got here the requested id was not cached
-            raise HTTPException(
-                status_code=404, detail=f"Element not found in table {feed_id}"
-            )
-
-    # If we got here we there were no match with the activated parsed
-    raise HTTPException(status_code=404, detail="Feed not found")
+    active_parser = get_parser(feed_id)
+    cached_item = active_parser.cache.recover_from_cache(id_=id_)
+    if cached_item:
+        return f"""
+        <html><head></head><body>{ cached_item["description"] }</body></html>
+        """
+    # If we got here the requested id was not cached
+    raise HTTPException(status_code=404, detail=f"Element not found in table {feed_id}")
 
 
 @app.get("/preview/{feed_id}/", response_class=HTMLResponse)
 def preview(feed_id: str, id_: str):
     """Used to quickly preview an item, it will not hit nor update the cache. Useful when debugging a parser."""
-    for active_parser in active_parsers:
-        if feed_id == active_parser.name:
-            browser = Browser()
-            try:
-                parsed_source = active_parser.parse_source(url=id_, browser=browser)
-                return f"""
-                <html><head></head><body>{ parsed_source }</body></html>
-                """
-            finally:
-                browser.quit()
-
-    # If we got here we there were no match with the activated parsed
-    raise HTTPException(status_code=404, detail="Feed not found")
+    active_parser = get_parser(feed_id)
+    browser = new_browser()
+    try:
+        parsed_source = active_parser.parse_source(url=id_, browser=browser)
+        return f"""
+        <html><head></head><body>{ parsed_source }</body></html>
+        """
+    finally:
+        browser.quit()
 
 
 @app.get("/flush/{feed_id}/")
 def flush_cache(feed_id: str):
-    for active_parser in active_parsers:
-        if feed_id == active_parser.name:
-            active_parser.cache.flush_cache()
-            return {f"{feed_id}": "cache flushed"}
-    raise HTTPException(status_code=404, detail="Feed not found")
+    get_parser(feed_id).cache.flush_cache()
+    return {f"{feed_id}": "cache flushed"}
+
+
+@app.get("/rerender/{feed_id}/")
+def rerender(feed_id: str, force: bool = False):
+    """Rebuild the cached descriptions from the stored captures, without scraping anything.
+
+    Only the ones created by an older parser version are rebuilt, unless force is set."""
+    rerendered = get_parser(feed_id).rerender(force)
+    return {f"{feed_id}": f"{rerendered} descriptions rerendered"}
+
+
+@app.get("/failures/{feed_id}/")
+def failures(feed_id: str):
+    """List the entries that recently failed parsing, with their error and when they will be tried again."""
+    get_parser(feed_id)
+    return FailureCache.recover_feed_failures(feed_id)
+
+
+@app.get("/failures/{feed_id}/flush/")
+def flush_failures(feed_id: str, id_: Optional[str] = None):
+    """Forget the failures of a feed (or just id_), so they will be parsed again on the next request."""
+    get_parser(feed_id)
+    if id_:
+        ids = [id_]
+    else:
+        ids = [failure["id"] for failure in FailureCache.recover_feed_failures(feed_id)]
+    FailureCache.delete_from_cache(ids)
+    return {f"{feed_id}": f"{len(ids)} failures flushed"}
+
+
+@app.get("/scheduler/")
+def scheduler_stats():
+    """Queue depth, running requests and current rate of every scraped domain, in this worker process only."""
+    return scheduler.stats()
+
+
+@app.get("/browsers/")
+def browsers_stats():
+    """Memory, pages opened and age of every running chrome instance."""
+    return watchdog.stats()
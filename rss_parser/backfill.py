@@ -0,0 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock, local
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from feedparser.util import FeedParserDict
+
+from rss_parser.cache.failures import FailureCache
+from rss_parser.logger import log
+from rss_parser.parser import Parser, parse_feed
+from rss_parser.selenium import Browser, new_browser
+
+
+def get_entries(
+    parser: Type[Parser], urls: Optional[List[str]] = None
+) -> List[FeedParserDict]:
+    """Return the feed entries, or only the ones of urls.
+
+    Urls not in the feed anymore are skipped: their publishing date is unknown, and a made up one would break
+    the prune order and the /items/ since queries."""
+    entries = [
+        entry
+        for entry in parse_feed(parser.url)["entries"]
+        if not parser.skip_entry(entry)
+    ]
+    if not urls:
+        return entries
+    by_link = {entry["link"]: entry for entry in entries}
+    missing = [url for url in urls if url not in by_link]
+    if missing:
+        log.warning(f"BACKFILL SKIPPED, not in the feed: {', '.join(missing)}")
+    return [by_link[url] for url in urls if url in by_link]
+
+
+def backfill(
+    parser: Type[Parser],
+    entries: List[FeedParserDict],
+    browsers: int = 2,
+    batch_size: int = 20,
+    progress: Optional[Callable[[int, int, str, Optional[str]], None]] = None,
+) -> Dict[str, int]:
+    """Scrape the entries not cached yet with up to browsers browsers in parallel, saving them batch_size at a time.
+
+    Every batch is saved in a single transaction, so an interrupted backfill loses at most one batch: running it
+    again only scrapes what's still missing. Entries backing off after a failure are left alone. progress is
+    called with (done, total, url, error) after every scraped entry."""
+    FailureCache.init()
+    links = [entry["link"] for entry in entries]
+    cached = parser.cache.recover_many_from_cache(links)
+    failures = FailureCache.recover_many_from_cache(links)
+    missing = [entry for entry in entries if entry["link"] not in cached]
+    todo = [
+        entry
+        for entry in missing
+        if not FailureCache.is_backing_off(failures.get(entry["link"]))
+    ]
+
+    # one browser per worker thread
+    thread_data = local()
+    opened: List[Browser] = []
+    opened_lock = Lock()
+
+    def scrape(entry: FeedParserDict) -> Any:
+        if not hasattr(thread_data, "browser"):
+            thread_data.browser = new_browser()
+            with opened_lock:
+                opened.append(thread_data.browser)
+        return parser.scrape(entry, thread_data.browser)
+
+    rows, captures = [], []
+
+    def flush() -> None:
+        parser.cache.save_many_to_cache(rows)
+        parser.captures.save_many_to_cache(captures)
+        # a success resets the backoff of entries that failed before
+        FailureCache.delete_from_cache(
+            [row["id"] for row in rows if row["id"] in failures]
+        )
+        rows.clear()
+        captures.clear()
+
+    stats = {
+        "cached": len(entries) - len(missing),
+        "backing_off": len(missing) - len(todo),
+        "scraped": 0,
+        "failed": 0,
+    }
+    executor = ThreadPoolExecutor(max_workers=browsers, thread_name_prefix="backfill")
+    try:
+        futures = {executor.submit(scrape, entry): entry for entry in todo}
+        for done, future in enumerate(as_completed(futures), start=1):
+            entry = futures[future]
+            error = None
+            try:
+                row, capture = future.result()
+                rows.append(row)
+                captures.append(capture)
+                stats["scraped"] += 1
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                log.error(f"BACKFILL FAILED: {entry['link']} - {error}")
+                FailureCache.record(
+                    parser.name,
+                    entry["link"],
+                    entry["title"],
+                    error,
+                    failures.get(entry["link"]),
+                )
+                stats["failed"] += 1
+            if len(rows) >= batch_size:
+                flush()
+            if progress:
+                progress(done, len(todo), entry["link"], error)
+    finally:
+        # keep what was already scraped, even when interrupted
+        flush()
+        executor.shutdown(wait=True, cancel_futures=True)
+        for browser in opened:
+            browser.quit()
+    return stats
@@ -0,0 +1,97 @@
+from abc import ABC
+from typing import Any, Dict, List, Optional
+
+from rss_parser import config
+from rss_parser.cache.backend import CacheBackend
+from rss_parser.logger import cache_log
+
+_backend: Optional[CacheBackend] = None
+
+
+def get_backend() -> CacheBackend:
+    """Return the backend selected by config.CACHE_BACKEND, shared by every Cache."""
+    global _backend
+    if _backend is None:
+        if config.CACHE_BACKEND == "sqlite":
+            from rss_parser.cache.sqlite_backend import SqliteBackend
+
+            _backend = SqliteBackend(config.SQLITE_DB)
+        elif config.CACHE_BACKEND == "redis":
+            from rss_parser.cache.redis_backend import RedisBackend
+
+            _backend = RedisBackend(
+                config.REDIS_URL, config.REDIS_PREFIX, config.REDIS_TTL
+            )
+        else:
+            raise Exception(f"Unknown cache backend: {config.CACHE_BACKEND}")
+    return _backend
+
+
+def set_backend(backend: CacheBackend) -> None:
+    """Override the configured backend, e.g. with a fakeredis backed RedisBackend."""
+    global _backend
+    _backend = backend
+
+
+class Cache(ABC):
+    """A parser cache, stored in a table (or namespace) of the configured backend.
+
+    Subclasses declare the table name, its columns and how many entries should be kept."""
+
+    table: str
+    columns: Dict[str, str]
+    order_by: str = "published"
+    max_entries: int = 100
+
+    @classmethod
+    def init(cls) -> None:
+        get_backend().init_table(cls.table, cls.columns, cls.order_by)
+        cache_log(f"{cls.table}: cache ready.")
+
+    @classmethod
+    def recover_from_cache(cls, id_: str) -> Optional[Dict[str, str]]:
+        return get_backend().recover(cls.table, id_)
+
+    @classmethod
+    def recover_many_from_cache(cls, ids: List[str]) -> Dict[str, Dict[str, str]]:
+        return get_backend().recover_many(cls.table, ids)
+
+    @classmethod
+    def recover_page_from_cache(
+        cls, since: int, after_id: Optional[str] = None, limit: int = 50
+    ) -> List[Dict[str, str]]:
+        """Recover the entries saved after since (and after_id, when more share the same since), in save order.
+
+        since is a CACHED key, a microsecond epoch."""
+        return get_backend().recover_page(cls.table, since, after_id, limit)
+
+    @classmethod
+    def recover_all_from_cache(cls) -> List[Dict[str, str]]:
+        """Recover every cached entry, most recent first."""
+        return get_backend().recover_all(cls.table)
+
+    @classmethod
+    def delete_from_cache(cls, ids: List[str]) -> None:
+        get_backend().delete(cls.table, ids)
+
+    @classmethod
+    def prune(cls, max_entries: Optional[int] = None) -> None:
+        """Keeps in cache only the most recent max_entries entries."""
+        pruned = get_backend().prune(cls.table, max_entries or cls.max_entries)
+        if pruned:
+            cache_log(f"{cls.table}: pruned {pruned} old entries.")
+
+    @classmethod
+    def flush_cache(cls) -> None:
+        get_backend().truncate(cls.table)
+
+    @classmethod
+    def save_to_cache(cls, row: Dict[str, Any]) -> Dict[str, Any]:
+        get_backend().save(cls.table, row)
+        return row
+
+    @classmethod
+    def save_many_to_cache(cls, rows: List[Dict[str, Any]]) -> None:
+        """Save rows in a single transaction."""
+        if rows:
+            get_backend().save_many(cls.table, rows)
@@ -0,0 +1,81 @@
+import datetime
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+# Column every backend fills on save: a microsecond epoch, strictly increasing in commit order within a table
+CACHED = "cached"
+
+
+class CacheBackend(ABC):
+    """Storage used by every Cache. Rows are plain dicts keyed by column name, the 'id' column is the key.
+
+    Besides the declared columns, every row gets a CACHED key when saved: rows saved later always get a greater
+    one, so (CACHED, id) is what readers interested only in new or changed rows page on."""
+
+    @abstractmethod
+    def init_table(self, table: str, columns: Dict[str, str], order_by: str) -> None:
+        """Prepare the storage for a table.
+
+        order_by is the indexed column, holding a UTC epoch, used to decide which entries are the oldest. Rows
+        saved by older versions, which stored it as a stringified datetime, are migrated. Rows without a CACHED
+        key get one derived from order_by."""
+        pass
+
+    @abstractmethod
+    def save(self, table: str, row: Dict[str, Any]) -> None:
+        pass
+
+    @abstractmethod
+    def save_many(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        """Save rows, all with the same columns, in a single transaction."""
+        pass
+
+    @abstractmethod
+    def recover(self, table: str, id_: str) -> Optional[Dict[str, str]]:
+        pass
+
+    @abstractmethod
+    def recover_many(self, table: str, ids: List[str]) -> Dict[str, Dict[str, str]]:
+        """Recover every cached row among ids with a single round trip, keyed by id."""
+        pass
+
+    @abstractmethod
+    def recover_page(
+        self, table: str, since: int, after_id: Optional[str], limit: int
+    ) -> List[Dict[str, str]]:
+        """Recover up to limit rows saved after (since, after_id), sorted by (CACHED, id).
+
+        Without after_id, every row whose CACHED equals since is skipped too. The (since, after_id) row itself
+        does not need to exist anymore."""
+        pass
+
+    @abstractmethod
+    def recover_all(self, table: str) -> List[Dict[str, str]]:
+        pass
+
+    @abstractmethod
+    def delete(self, table: str, ids: List[str]) -> None:
+        pass
+
+    @abstractmethod
+    def prune(self, table: str, max_entries: int) -> int:
+        """Keep only the max_entries most recent rows, return how many were deleted."""
+        pass
+
+    @abstractmethod
+    def truncate(self, table: str) -> None:
+        pass
+
+
+def legacy_timestamp_to_epoch(value: str) -> int:
+    """Convert a timestamp stored by older versions as str(datetime) to a UTC epoch."""
+    date = datetime.datetime.fromisoformat(value)
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return int(date.timestamp())
+
+
+def next_cached(last: int) -> int:
+    """The CACHED key of the next saved row: now, or right after last if the clock is behind it."""
+    return max(last + 1, time.time_ns() // 1000)
@@ -0,0 +1,51 @@
+import base64
+import json
+import zlib
+from time import time
+from typing import Any, Dict, Tuple
+
+from rss_parser.cache import Cache
+
+
+class CaptureCache(Cache):
+    """Stores, compressed, what was fetched to build a cached description: the article node and the pages opened
+    to resolve its embeds. It allows rebuilding the descriptions later without a browser or network access.
+
+    Every parser declares its own subclass, next to its cache."""
+
+    columns: Dict[str, str] = {
+        "id": "text primary key",
+        "version": "integer",
+        "article": "text",
+        "embeds": "text",
+        "captured": "integer",
+    }
+    order_by: str = "captured"
+
+    @staticmethod
+    def new_capture(
+        url: str, version: int, article: str, embeds: Dict[str, str]
+    ) -> Dict[str, Any]:
+        return {
+            "id": url,
+            "version": version,
+            "article": _compress(article),
+            "embeds": _compress(json.dumps(embeds)),
+            "captured": int(time()),
+        }
+
+    @staticmethod
+    def load_capture(capture: Dict[str, str]) -> Tuple[str, Dict[str, str]]:
+        """Return the article html and the embedded pages of a recovered capture."""
+        return _decompress(capture["article"]), json.loads(
+            _decompress(capture["embeds"])
+        )
+
+
+def _compress(data: str) -> str:
+    # base64 keeps it a plain string for every backend
+    return base64.b64encode(zlib.compress(data.encode("utf-8"))).decode("ascii")
+
+
+def _decompress(data: str) -> str:
+    return zlib.decompress(base64.b64decode(data)).decode("utf-8")
@@ -0,0 +1,64 @@
+from time import time
+from typing import Any, Dict, List, Optional
+
+from rss_parser.cache import Cache
+
+
+class FailureCache(Cache):
+    """Negative cache, shared by every parser: remembers the entries that could not be parsed.
+
+    Until retry_after an entry is served as broken without trying to parse it again. The wait doubles after every
+    failure, from base_backoff up to max_backoff seconds."""
+
+    table: str = "failures"
+    columns: Dict[str, str] = {
+        "id": "text primary key",
+        "feed": "text",
+        "title": "text",
+        "error": "text",
+        "failures": "integer",
+        "last_failure": "integer",
+        "retry_after": "integer",
+    }
+    order_by: str = "last_failure"
+    max_entries: int = 500
+
+    base_backoff: int = 5 * 60
+    max_backoff: int = 24 * 60 * 60
+
+    @classmethod
+    def record(
+        cls,
+        feed: str,
+        url: str,
+        title: str,
+        error: str,
+        previous: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """Save a new failure for url, previous is its already cached failure if any."""
+        failures = int(previous["failures"]) + 1 if previous else 1
+        now = int(time())
+        backoff = min(cls.base_backoff * 2 ** (failures - 1), cls.max_backoff)
+        return cls.save_to_cache(
+            {
+                "id": url,
+                "feed": feed,
+                "title": title,
+                "error": error,
+                "failures": failures,
+                "last_failure": now,
+                "retry_after": now + backoff,
+            }
+        )
+
+    @staticmethod
+    def is_backing_off(failure: Optional[Dict[str, str]]) -> bool:
+        return bool(failure) and int(failure["retry_after"]) > time()
+
+    @classmethod
+    def recover_feed_failures(cls, feed: str) -> List[Dict[str, str]]:
+        return [
+            failure
+            for failure in cls.recover_all_from_cache()
+            if failure["feed"] == feed
+        ]
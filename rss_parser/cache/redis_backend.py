@@ -0,0 +1,208 @@
+from typing import Any, Dict, List, Optional
+
+from rss_parser.cache.backend import (
+    CACHED,
+    CacheBackend,
+    legacy_timestamp_to_epoch,
+    next_cached,
+)
+
+
+class RedisBackend(CacheBackend):
+    """Cache shared over the network, so that several nodes can serve the same feeds.
+
+    Every row is stored in a hash at '{prefix}:{table}:{id}', while a sorted set at '{prefix}:{table}' indexes
+    the ids by their order_by column and one at '{prefix}:{table}:#cached' by CACHED. Needs the 'redis' extra."""
+
+    def __init__(self, url: str, prefix: str, ttl: int = 0, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError(
+                    "The redis cache backend needs the 'redis' package, install the 'redis' extra."
+                ) from e
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.order_by: Dict[str, str] = {}
+
+    def init_table(self, table: str, columns: Dict[str, str], order_by: str) -> None:
+        self.order_by[table] = order_by
+        # migrate rows where order_by is still a stringified datetime
+        ids = self.client.zrange(self._index(table), 0, -1)
+        pipe = self.client.pipeline()
+        for id_ in ids:
+            pipe.hget(self._key(table, id_), order_by)
+        legacy_rows = [
+            (id_, value)
+            for id_, value in zip(ids, pipe.execute())
+            if value and not value.isdigit()
+        ]
+        if legacy_rows:
+            pipe = self.client.pipeline()
+            for id_, value in legacy_rows:
+                epoch = legacy_timestamp_to_epoch(value)
+                pipe.hset(self._key(table, id_), order_by, epoch)
+                pipe.zadd(self._index(table), {id_: epoch})
+            pipe.execute()
+        # rows saved before CACHED existed
+        cached = set(self.client.zrange(self._cached_index(table), 0, -1))
+        missing = [
+            (id_, score)
+            for id_, score in self.client.zrange(
+                self._index(table), 0, -1, withscores=True
+            )
+            if id_ not in cached
+        ]
+        if missing:
+            pipe = self.client.pipeline()
+            for id_, score in missing:
+                pipe.hset(self._key(table, id_), CACHED, int(score) * 1000000)
+                pipe.zadd(self._cached_index(table), {id_: int(score) * 1000000})
+            pipe.execute()
+
+    def save(self, table: str, row: Dict[str, Any]) -> None:
+        self.save_many(table, [row])
+
+    def save_many(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        cached_index = self._cached_index(table)
+
+        def write(pipe) -> None:
+            # cached_index is watched: if another save commits first, this one starts over with a greater CACHED
+            last = pipe.zrange(cached_index, -1, -1, withscores=True)
+            first = next_cached(int(last[0][1]) if last else 0)
+            pipe.multi()
+            for n, row in enumerate(rows):
+                key = self._key(table, row["id"])
+                pipe.delete(key)
+                pipe.hset(
+                    key,
+                    mapping={
+                        **{k: self._to_str(v) for k, v in row.items()},
+                        CACHED: first + n,
+                    },
+                )
+                if self.ttl > 0:
+                    pipe.expire(key, self.ttl)
+                pipe.zadd(
+                    self._index(table),
+                    {row["id"]: self._score(row[self.order_by[table]])},
+                )
+                pipe.zadd(cached_index, {row["id"]: first + n})
+
+        # a transaction, as pipelines are MULTI/EXEC wrapped
+        self.client.transaction(write, cached_index)
+
+    def recover(self, table: str, id_: str) -> Optional[Dict[str, str]]:
+        element = self.client.hgetall(self._key(table, id_))
+        if element:
+            return element
+        return None
+
+    def recover_many(self, table: str, ids: List[str]) -> Dict[str, Dict[str, str]]:
+        pipe = self.client.pipeline()
+        for id_ in ids:
+            pipe.hgetall(self._key(table, id_))
+        return {id_: element for id_, element in zip(ids, pipe.execute()) if element}
+
+    def recover_page(
+        self, table: str, since: int, after_id: Optional[str], limit: int
+    ) -> List[Dict[str, str]]:
+        # members with the same score are sorted by id, just like sqlite does
+        index = self._cached_index(table)
+        if after_id is None:
+            start = self.client.zcount(index, "-inf", since)
+        else:
+            # the after_id row may be gone, count what comes before it
+            start = self.client.zcount(index, "-inf", f"({since}") + len(
+                [
+                    id_
+                    for id_ in self.client.zrangebyscore(index, since, since)
+                    if id_ <= after_id
+                ]
+            )
+        # ids whose row was expired by the ttl are still indexed: skip them, until the page is full
+        rows, expired = [], []
+        while len(rows) < limit:
+            ids = self.client.zrange(index, start, start + limit - len(rows) - 1)
+            if not ids:
+                break
+            start += len(ids)
+            elements = self.recover_many(table, ids)
+            rows += [elements[id_] for id_ in ids if id_ in elements]
+            expired += [id_ for id_ in ids if id_ not in elements]
+        if expired:
+            pipe = self.client.pipeline()
+            pipe.zrem(index, *expired)
+            pipe.zrem(self._index(table), *expired)
+            pipe.execute()
+        return rows
+
+    def recover_all(self, table: str) -> List[Dict[str, str]]:
+        ids = self.client.zrevrange(self._index(table), 0, -1)
+        return list(self.recover_many(table, ids).values())
+
+    def delete(self, table: str, ids: List[str]) -> None:
+        if not ids:
+            return
+        pipe = self.client.pipeline()
+        pipe.delete(*[self._key(table, id_) for id_ in ids])
+        pipe.zrem(self._index(table), *ids)
+        pipe.zrem(self._cached_index(table), *ids)
+        pipe.execute()
+
+    def prune(self, table: str, max_entries: int) -> int:
+        index = self._index(table)
+        self._drop_expired(table)
+        to_prune = self.client.zcard(index) - max_entries
+        if to_prune > 0:
+            ids = self.client.zrange(index, 0, to_prune - 1)
+            pipe = self.client.pipeline()
+            pipe.delete(*[self._key(table, id_) for id_ in ids])
+            pipe.zrem(index, *ids)
+            pipe.zrem(self._cached_index(table), *ids)
+            pipe.execute()
+        return max(to_prune, 0)
+
+    def truncate(self, table: str) -> None:
+        keys = list(self.client.scan_iter(match=f"{self._index(table)}:*"))
+        keys.append(self._index(table))
+        self.client.delete(*keys)
+
+    def _drop_expired(self, table: str) -> None:
+        """Remove from the indexes the ids whose row was expired by the ttl."""
+        if self.ttl <= 0:
+            return
+        index = self._index(table)
+        ids = self.client.zrange(index, 0, -1)
+        pipe = self.client.pipeline()
+        for id_ in ids:
+            pipe.exists(self._key(table, id_))
+        expired = [id_ for id_, exists in zip(ids, pipe.execute()) if not exists]
+        if expired:
+            pipe = self.client.pipeline()
+            pipe.zrem(index, *expired)
+            pipe.zrem(self._cached_index(table), *expired)
+            pipe.execute()
+
+    def _index(self, table: str) -> str:
+        return f"{self.prefix}:{table}"
+
+    def _cached_index(self, table: str) -> str:
+        # ids are urls, they never start with '#'
+        return f"{self._index(table)}:#cached"
+
+    def _key(self, table: str, id_: str) -> str:
+        return f"{self._index(table)}:{id_}"
+
+    @staticmethod
+    def _to_str(value: Any) -> str:
+        if value is None:
+            return ""
+        return str(value)
+
+    @staticmethod
+    def _score(value: Any) -> float:
+        return float(value)
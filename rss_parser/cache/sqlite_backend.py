@@ -0,0 +1,156 @@
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from rss_parser.cache.backend import (
+    CACHED,
+    CacheBackend,
+    legacy_timestamp_to_epoch,
+    next_cached,
+)
+
+
+class SqliteBackend(CacheBackend):
+    """Local cache stored in a single sqlite file."""
+
+    def __init__(self, db: str):
+        self.db = db
+        self.order_by: Dict[str, str] = {}
+
+    def init_table(self, table: str, columns: Dict[str, str], order_by: str) -> None:
+        self.order_by[table] = order_by
+        columns = {**columns, CACHED: "integer"}
+        connection = sqlite3.connect(self.db)
+        columns_def = ", ".join(f"{name} {type_}" for name, type_ in columns.items())
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns_def})")
+        # add the columns introduced after the table was created
+        existing_columns = {
+            column[1] for column in connection.execute(f"PRAGMA table_info({table})")
+        }
+        for name, type_ in columns.items():
+            if name not in existing_columns:
+                connection.execute(f"ALTER TABLE {table} ADD COLUMN {name} {type_}")
+        for column in (order_by, CACHED):
+            connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_{column} ON {table} ({column})"
+            )
+        # migrate rows where order_by is still a stringified datetime
+        legacy_rows = connection.execute(
+            f"SELECT id, {order_by} FROM {table} WHERE typeof({order_by}) = 'text'"
+        ).fetchall()
+        if legacy_rows:
+            connection.executemany(
+                f"UPDATE {table} SET {order_by} = ? WHERE id = ?",
+                [(legacy_timestamp_to_epoch(value), id_) for id_, value in legacy_rows],
+            )
+        # rows saved before CACHED existed
+        connection.execute(
+            f"UPDATE {table} SET {CACHED} = {order_by} * 1000000 WHERE {CACHED} IS NULL"
+        )
+        connection.commit()
+        connection.close()
+
+    def save(self, table: str, row: Dict[str, Any]) -> None:
+        self.save_many(table, [row])
+
+    def save_many(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        connection = sqlite3.connect(self.db)
+        columns = [column for column in rows[0] if column != CACHED] + [CACHED]
+        data_placeholder = ", ".join(map(lambda x: "?", columns))
+        command = f"""INSERT OR REPLACE INTO {table} ({", ".join(columns)}) VALUES ({data_placeholder})"""
+        with connection:
+            # lock the db for writing before reading the last CACHED, so that it grows in commit order
+            connection.execute("BEGIN IMMEDIATE")
+            last = connection.execute(f"SELECT MAX({CACHED}) FROM {table}").fetchone()[
+                0
+            ]
+            first = next_cached(last or 0)
+            connection.executemany(
+                command,
+                [
+                    tuple(row[column] for column in columns[:-1]) + (first + n,)
+                    for n, row in enumerate(rows)
+                ],
+            )
+        connection.close()
+
+    def recover(self, table: str, id_: str) -> Optional[Dict[str, str]]:
+        connection = sqlite3.connect(self.db)
+        connection.row_factory = sqlite3.Row
+        element = connection.execute(
+            "SELECT * FROM '%s' WHERE id=:id" % table, {"id": id_}
+        ).fetchone()
+        connection.close()
+
+        if element:
+            return dict(element)
+        return element
+
+    def recover_many(self, table: str, ids: List[str]) -> Dict[str, Dict[str, str]]:
+        if not ids:
+            return {}
+        connection = sqlite3.connect(self.db)
+        connection.row_factory = sqlite3.Row
+        ids_placeholder = ", ".join(map(lambda x: "?", ids))
+        elements = connection.execute(
+            "SELECT * FROM '%s' WHERE id IN (%s)" % (table, ids_placeholder), ids
+        ).fetchall()
+        connection.close()
+        return {element["id"]: dict(element) for element in elements}
+
+    def recover_page(
+        self, table: str, since: int, after_id: Optional[str], limit: int
+    ) -> List[Dict[str, str]]:
+        connection = sqlite3.connect(self.db)
+        connection.row_factory = sqlite3.Row
+        if after_id is None:
+            elements = connection.execute(
+                f"SELECT * FROM {table} WHERE {CACHED} > ? ORDER BY {CACHED}, id LIMIT ?",
+                (since, limit),
+            ).fetchall()
+        else:
+            elements = connection.execute(
+                f"""SELECT * FROM {table} WHERE {CACHED} > ? OR ({CACHED} = ? AND id > ?)
+                ORDER BY {CACHED}, id LIMIT ?""",
+                (since, since, after_id, limit),
+            ).fetchall()
+        connection.close()
+        return [dict(element) for element in elements]
+
+    def recover_all(self, table: str) -> List[Dict[str, str]]:
+        connection = sqlite3.connect(self.db)
+        connection.row_factory = sqlite3.Row
+        elements = connection.execute(
+            f"SELECT * FROM {table} ORDER BY {self.order_by[table]} DESC"
+        ).fetchall()
+        connection.close()
+        return [dict(element) for element in elements]
+
+    def delete(self, table: str, ids: List[str]) -> None:
+        connection = sqlite3.connect(self.db)
+        connection.executemany(
+            f"DELETE FROM {table} WHERE id = ?", [(id_,) for id_ in ids]
+        )
+        connection.commit()
+        connection.close()
+
+    def prune(self, table: str, max_entries: int) -> int:
+        connection = sqlite3.connect(self.db)
+        count = connection.execute(f"""SELECT count(id) FROM {table}""").fetchone()[0]
+        to_prune = count - max_entries
+        if to_prune > 0:
+            connection.execute(
+                f"""
+            DELETE FROM {table} WHERE {table}.id in
+            (SELECT id FROM {table} ORDER BY {self.order_by[table]} ASC limit ?)
+            """,
+                (to_prune,),
+            )
+            connection.commit()
+        connection.close()
+        return max(to_prune, 0)
+
+    def truncate(self, table: str) -> None:
+        connection = sqlite3.connect(self.db)
+        connection.execute("DELETE FROM '%s'" % table)
+        connection.commit()
+        connection.close()
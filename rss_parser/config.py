@@ -0,0 +1,59 @@
+import os
+
+# Cache backend: "sqlite" (default, local file) or "redis" (shareable between nodes)
+CACHE_BACKEND = os.environ.get("RSS_PARSER_CACHE_BACKEND", "sqlite")
+
+# SQLite backend
+SQLITE_DB = os.environ.get("RSS_PARSER_SQLITE_DB", "feeds_cache.db")
+
+# Redis backend
+REDIS_URL = os.environ.get("RSS_PARSER_REDIS_URL", "redis://localhost:6379/0")
+REDIS_PREFIX = os.environ.get("RSS_PARSER_REDIS_PREFIX", "rss_parser")
+# Seconds after which a cached entry expires on its own, 0 disables expiration
+REDIS_TTL = int(os.environ.get("RSS_PARSER_REDIS_TTL", "0"))
+
+# Comma separated feed names to serve, empty enables every discovered parser
+ENABLED_FEEDS = [
+    feed for feed in os.environ.get("RSS_PARSER_FEEDS", "").split(",") if feed
+]
+# Parsers not exposed through the 'rss_parser.parsers' entry points, as comma separated 'name=module:Class'
+EXTRA_PARSERS = dict(
+    spec.split("=", 1)
+    for spec in os.environ.get("RSS_PARSER_EXTRA_PARSERS", "").split(",")
+    if spec
+)
+# Override the upstream feed url of some parsers, as comma separated 'name=url'
+FEED_URLS = dict(
+    spec.split("=", 1)
+    for spec in os.environ.get("RSS_PARSER_FEED_URLS", "").split(",")
+    if spec
+)
+
+# Browser used to scrape: "chrome" (default, through selenium) or "http" (plain requests, no javascript)
+BROWSER = os.environ.get("RSS_PARSER_BROWSER", "chrome")
+
+# Politeness towards the scraped domains: concurrent requests and requests per second, by default and per domain.
+# They are enforced per process: with several uvicorn workers or nodes, divide them by the number of processes
+SCHEDULER_CONCURRENCY = int(os.environ.get("RSS_PARSER_DOMAIN_CONCURRENCY", "2"))
+SCHEDULER_RATE = float(os.environ.get("RSS_PARSER_DOMAIN_RATE", "2"))
+# Comma separated 'domain=concurrency:rate', e.g. 'www.ilpost.it=4:2,t.me=1:0.5'
+DOMAIN_LIMITS = {
+    domain: (int(limits.split(":")[0]), float(limits.split(":")[1]))
+    for domain, limits in (
+        spec.split("=", 1)
+        for spec in os.environ.get("RSS_PARSER_DOMAIN_LIMITS", "").split(",")
+        if spec
+    )
+}
+# The rate never drops below this when adapting to throttling
+SCHEDULER_MIN_RATE = float(os.environ.get("RSS_PARSER_DOMAIN_MIN_RATE", "0.05"))
+# Seconds after which a response is considered slow, and the domain rate is lowered
+SCHEDULER_SLOW_RESPONSE = float(os.environ.get("RSS_PARSER_SLOW_RESPONSE", "10"))
+
+# Chrome gets restarted once its processes use more than this many MB, or after this many pages
+BROWSER_MAX_RSS = int(os.environ.get("RSS_PARSER_BROWSER_MAX_RSS_MB", "1024")) << 20
+BROWSER_MAX_NAVIGATIONS = int(
+    os.environ.get("RSS_PARSER_BROWSER_MAX_NAVIGATIONS", "200")
+)
+# Seconds between two browser watchdog sweeps (memory checks and orphans reaping)
+WATCHDOG_INTERVAL = float(os.environ.get("RSS_PARSER_WATCHDOG_INTERVAL", "30"))
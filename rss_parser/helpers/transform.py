@@ -0,0 +1,95 @@
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from bs4.element import Tag
+
+Handler = Callable[..., Optional[str]]
+
+
+class Rule:
+    """Matches a tag by name, by classes (all of them are needed) and by a substring of its id."""
+
+    def __init__(
+        self,
+        priority: int,
+        handler: Handler,
+        tag: str,
+        classes: Tuple[str, ...] = (),
+        id_: Optional[str] = None,
+    ):
+        self.priority = priority
+        self.handler = handler
+        self.tag = tag
+        self.classes = classes
+        self.id_ = id_
+
+    def matches(self, node: Tag, node_classes: List[str]) -> bool:
+        if any(class_ not in node_classes for class_ in self.classes):
+            return False
+        if self.id_ is not None and self.id_ not in node.attrs.get("id", ""):
+            return False
+        return True
+
+
+class Transformer:
+    """Turns a sequence of nodes into html, passing every node to the first registered rule matching it.
+
+    Rules are indexed by tag and by their first class, so every node is only checked against the few rules that
+    could match it, in a single pass. Handlers get the node plus the extra transform() arguments and return the
+    html to append, or None."""
+
+    def __init__(self):
+        self._by_tag: Dict[str, List[Rule]] = defaultdict(list)
+        self._by_class: Dict[Tuple[str, str], List[Rule]] = defaultdict(list)
+        # candidate rules, by priority, of every (tag, indexed classes) already seen
+        self._candidates: Dict[Tuple[str, Tuple[str, ...]], List[Rule]] = {}
+        self._count = 0
+
+    def rule(
+        self, tag: str, classes: Tuple[str, ...] = (), id_: Optional[str] = None
+    ) -> Callable[[Handler], Handler]:
+        """Decorator registering a handler. Rules registered first win when more than one matches."""
+
+        def decorator(handler: Handler) -> Handler:
+            rule = Rule(self._count, handler, tag, classes, id_)
+            self._count += 1
+            if classes:
+                self._by_class[(tag, classes[0])].append(rule)
+            else:
+                self._by_tag[tag].append(rule)
+            self._candidates.clear()
+            return handler
+
+        return decorator
+
+    def match(self, node: Tag) -> Optional[Rule]:
+        node_classes = node.attrs.get("class", [])
+        # only classes some rule is indexed by, so per item classes (e.g. 'wp-image-1234') don't grow the memo
+        indexed = tuple(
+            class_ for class_ in node_classes if (node.name, class_) in self._by_class
+        )
+        key = (node.name, indexed)
+        candidates = self._candidates.get(key)
+        if candidates is None:
+            candidates = list(self._by_tag.get(node.name, []))
+            for class_ in indexed:
+                candidates += self._by_class[(node.name, class_)]
+            candidates.sort(key=lambda rule: rule.priority)
+            self._candidates[key] = candidates
+        for rule in candidates:
+            if rule.matches(node, node_classes):
+                return rule
+        return None
+
+    def transform(self, nodes: Iterable, *args) -> str:
+        parts = []
+        for node in nodes:
+            # skip strings, comments and the like
+            if not isinstance(node, Tag):
+                continue
+            rule = self.match(node)
+            if rule:
+                part = rule.handler(node, *args)
+                if part:
+                    parts.append(part)
+        return "".join(parts)
@@ -0,0 +1,74 @@
+import datetime
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from rss_parser.parser import Parser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_FEED_VERSION = "https://jsonfeed.org/version/1.1"
+
+_CURSOR = re.compile(r"(\d+):(.+)")
+
+
+def dumps(data: Any) -> bytes:
+    """Serialize to json, with orjson if installed (the 'fast-json' extra)."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def to_json_feed(
+    parser: Type[Parser],
+    rows: List[Dict[str, str]],
+    cursor: Optional[str],
+    next_url: Optional[str],
+) -> Dict[str, Any]:
+    """A JSON Feed of cached rows, '_cursor' is the since value to use to get the items cached after these."""
+    feed = {
+        "version": JSON_FEED_VERSION,
+        "title": parser.name,
+        "items": [_to_json_feed_item(row) for row in rows],
+        "_cursor": cursor,
+    }
+    if next_url:
+        feed["next_url"] = next_url
+    return feed
+
+
+def encode_cursor(cached: int, id_: str) -> str:
+    """An opaque cursor: the CACHED key and the id of the last row served."""
+    return f"{cached}:{id_}"
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[int, str]]:
+    """The (CACHED, id) pair of an encode_cursor() cursor, None if cursor is not one."""
+    match = _CURSOR.fullmatch(cursor)
+    if not match:
+        return None
+    return int(match[1]), match[2]
+
+
+def _to_json_feed_item(row: Dict[str, str]) -> Dict[str, Any]:
+    item = {
+        "id": row["id"],
+        "url": row["id"],
+        "title": row["title"],
+        "content_html": row["description"],
+        "date_published": _iso_date(row["published"]),
+    }
+    if row.get("updated"):
+        item["date_modified"] = _iso_date(row["updated"])
+    if row.get("author"):
+        item["authors"] = [{"name": row["author"]}]
+    return item
+
+
+def _iso_date(epoch: str) -> str:
+    return datetime.datetime.fromtimestamp(
+        int(epoch), tz=datetime.timezone.utc
+    ).isoformat()
@@ -17,3 +17,7 @@ def selenium_error(msg: str) -> None:
 
 def selenium_log(msg: str) -> None:
     log.info(f"[SELENIUM] {msg}")
+
+
+def scheduler_log(msg: str) -> None:
+    log.info(f"[SCHEDULER] {msg}")
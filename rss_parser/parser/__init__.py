@@ -1,14 +1,31 @@
+import calendar
 import datetime
-from time import sleep
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from threading import Lock
+from time import sleep, time
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
 
 import feedparser
 
 from abc import ABC, abstractmethod
+from bs4 import BeautifulSoup
+from bs4.element import Tag
 from rfeed import Feed, Item, Guid
 
 from rss_parser.cache import Cache
-from rss_parser.logger import log
-from rss_parser.selenium import Browser
+from rss_parser.cache.captures import CaptureCache
+from rss_parser.cache.failures import FailureCache
+from rss_parser.logger import log, parser_log
+from rss_parser.scheduler import scheduler
+from rss_parser.selenium import Browser, RecordingBrowser, ReplayBrowser, new_browser
+
+# Stale cached entries are re-scraped here, one batch at a time, while the cached version keeps being served
+_refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="refresh")
+_refreshing: Set[str] = set()
+_refreshing_lock = Lock()
 
 
 class Parser(ABC):
@@ -32,6 +49,17 @@ class Parser(ABC):
     def cache(self) -> Cache:
         pass
 
+    @property
+    @abstractmethod
+    def captures(self) -> CaptureCache:
+        pass
+
+    # Seconds after which a cached entry is re-scraped even if unchanged upstream, 0 disables it
+    refresh_ttl: int = 0
+
+    # Bump it when _create_description changes, so that cached descriptions can be rebuilt with rerender()
+    version: int = 1
+
     @classmethod
     @abstractmethod
     def parse_source(cls, url: str, browser: Browser) -> str:
@@ -40,50 +68,116 @@ class Parser(ABC):
     @classmethod
     @abstractmethod
     def parse_entry(
-        cls, entry: feedparser.util.FeedParserDict, browser: Browser
+        cls,
+        entry: feedparser.util.FeedParserDict,
+        browser: Browser,
+        cached_item: Optional[Dict[str, str]] = None,
     ) -> str:
+        """Return the Item for entry. cached_item, when given, is the entry already recovered from the cache."""
+        pass
+
+    @classmethod
+    @abstractmethod
+    def scrape(
+        cls, entry: feedparser.util.FeedParserDict, browser: Browser
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Scrape the entry page, return its cache row and its capture without saving them."""
+        pass
+
+    @classmethod
+    def skip_entry(cls, entry: feedparser.util.FeedParserDict) -> bool:
+        """True if the entry should not be part of the feed."""
+        return False
+
+    @classmethod
+    def scrape_entry(
+        cls, entry: feedparser.util.FeedParserDict, browser: Browser
+    ) -> Dict[str, Any]:
+        """Scrape the entry page, save it to the cache and return the cached row."""
+        row, capture = cls.scrape(entry, browser)
+        cls.captures.save_to_cache(capture)
+        return cls.cache.save_to_cache(row)
+
+    @classmethod
+    @abstractmethod
+    def _get_article_node(cls, url: str, browser: Browser) -> Tag:
+        pass
+
+    @classmethod
+    @abstractmethod
+    def _create_description(cls, article: Tag, browser: Browser) -> str:
         pass
 
     @classmethod
     def get_xml_feed(cls, limit: int = -1) -> str:
-        feed = feedparser.parse(cls.url)
+        feed = parse_feed(cls.url)
 
         entries = []
 
-        browser = Browser()
-
         if limit == -1:
             # Use the default_limit
             limit = cls.default_limit
 
-        # Iterate over feed["entries"], allowing skipping entries
-        read_entries = 0
-        while len(entries) < limit and read_entries < len(feed["entries"]):
-            entry = feed["entries"][read_entries]
-            read_entries += 1
-            tries = 0
-            while tries < 3:
-                try:
-                    log.debug(f"PARSING: {entry['link']} - {entry['title']}")
-                    entries.append(cls.parse_entry(entry, browser))
-                    break
-                except SkipEntryException:
-                    break
-                except TimeoutError as e:
-                    entries.append(
-                        cls._get_broken_item(entry["link"], entry["title"], str(e))
-                    )
-                    log.error(f"SKIPPED: {entry['link']} - Timed out when parsing")
-                except Exception as e:
+        # Recover every already cached entry and every known failure at once
+        links = [entry["link"] for entry in feed["entries"]]
+        cached_items = cls.cache.recover_many_from_cache(links)
+        failures = FailureCache.recover_many_from_cache(links)
+
+        browser = new_browser()
+        try:
+            # Iterate over feed["entries"], allowing skipping entries
+            read_entries = 0
+            while len(entries) < limit and read_entries < len(feed["entries"]):
+                entry = feed["entries"][read_entries]
+                read_entries += 1
+                link = entry["link"]
+                cached_item = cached_items.get(link)
+                failure = failures.get(link)
+                if not cached_item and FailureCache.is_backing_off(failure):
+                    # it failed recently, don't waste time trying again
                     entries.append(
-                        cls._get_broken_item(entry["link"], entry["title"], str(e))
+                        cls._get_broken_item(link, entry["title"], failure["error"])
                     )
-                    log.error(f"SKIPPED: {entry['link']} - Unknown error")
-                tries += 1
-                # wait a second, try to eliminate source availability errors
-                sleep(1)
+                    continue
+                error = None
+                tries = 0
+                while tries < 3:
+                    try:
+                        log.debug(f"PARSING: {link} - {entry['title']}")
+                        entries.append(cls.parse_entry(entry, browser, cached_item))
+                        error = None
+                        break
+                    except SkipEntryException:
+                        error = None
+                        break
+                    except TimeoutError as e:
+                        error = str(e) or "Timed out when parsing"
+                        log.error(f"SKIPPED: {link} - Timed out when parsing")
+                    except Exception as e:
+                        error = str(e)
+                        log.error(f"SKIPPED: {link} - Unknown error")
+                    tries += 1
+                    # wait a second, try to eliminate source availability errors
+                    sleep(1)
+                if error is not None:
+                    entries.append(cls._get_broken_item(link, entry["title"], error))
+                    FailureCache.record(cls.name, link, entry["title"], error, failure)
+                elif failure:
+                    FailureCache.delete_from_cache([link])
+        finally:
+            # never leave chrome running, even when the request dies mid-scrape
+            browser.quit()
 
-        browser.quit()
+        # Re-scrape the cached entries that changed upstream or are too old, unless their refresh keeps failing
+        stale_entries = [
+            entry
+            for entry in feed["entries"][:read_entries]
+            if entry["link"] in cached_items
+            and cls.is_stale(entry, cached_items[entry["link"]])
+            and not FailureCache.is_backing_off(failures.get(entry["link"]))
+        ]
+        if stale_entries:
+            cls.refresh_in_background(stale_entries)
 
         feed = Feed(
             title=feed["feed"]["title"],
@@ -96,6 +190,144 @@ class Parser(ABC):
 
         return feed.rss()
 
+    @classmethod
+    def is_stale(
+        cls, entry: feedparser.util.FeedParserDict, cached_item: Dict[str, str]
+    ) -> bool:
+        """True if the entry was updated upstream since it was cached, or if its refresh_ttl expired."""
+        if cached_item.get("updated") and cls._get_updated(entry) > int(
+            cached_item["updated"]
+        ):
+            return True
+        if (
+            cached_item.get("content_hash")
+            and cls._get_content_hash(entry) != cached_item["content_hash"]
+        ):
+            return True
+        if cls.refresh_ttl:
+            refreshed = int(cached_item.get("refreshed") or 0)
+            return time() - refreshed > cls.refresh_ttl
+        return False
+
+    @classmethod
+    def refresh_in_background(
+        cls, entries: List[feedparser.util.FeedParserDict]
+    ) -> None:
+        """Re-scrape entries in a background thread, skipping the ones already being refreshed."""
+        with _refreshing_lock:
+            entries = [entry for entry in entries if entry["link"] not in _refreshing]
+            _refreshing.update(entry["link"] for entry in entries)
+        if entries:
+            _refresh_executor.submit(cls._refresh, entries)
+
+    @classmethod
+    def _refresh(cls, entries: List[feedparser.util.FeedParserDict]) -> None:
+        failures = FailureCache.recover_many_from_cache(
+            [entry["link"] for entry in entries]
+        )
+        browser = new_browser()
+        try:
+            for entry in entries:
+                link = entry["link"]
+                try:
+                    cls.scrape_entry(entry, browser)
+                    parser_log(f"{cls.name}: refreshed {link}")
+                except Exception as e:
+                    # keep serving the old version, it will be retried once the backoff expires
+                    error = str(e) or type(e).__name__
+                    log.error(f"REFRESH FAILED: {link} - {error}")
+                    FailureCache.record(
+                        cls.name, link, entry["title"], error, failures.get(link)
+                    )
+                else:
+                    if link in failures:
+                        FailureCache.delete_from_cache([link])
+        finally:
+            browser.quit()
+            with _refreshing_lock:
+                _refreshing.difference_update(entry["link"] for entry in entries)
+
+    @classmethod
+    def rerender(cls, force: bool = False, workers: Optional[int] = None) -> int:
+        """Rebuild the cached descriptions from their captures, on every CPU core and without a browser.
+
+        Only descriptions created by an older parser version are rebuilt, unless force is set. Return how many
+        were rebuilt."""
+        captures = cls.captures.recover_all_from_cache()
+        items = cls.cache.recover_many_from_cache([c["id"] for c in captures])
+        captures = [
+            capture
+            for capture in captures
+            if capture["id"] in items
+            and (force or int(items[capture["id"]]["version"] or 0) < cls.version)
+        ]
+        if not captures:
+            return 0
+        # spawn: forking a process running threads (the api workers, the watchdog, ...) can deadlock
+        with ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            descriptions = list(executor.map(_render_capture, repeat(cls), captures))
+        cls.cache.save_many_to_cache(
+            [
+                {
+                    **items[capture["id"]],
+                    "description": description,
+                    "version": cls.version,
+                }
+                for capture, description in zip(captures, descriptions)
+            ]
+        )
+        parser_log(f"{cls.name}: rerendered {len(captures)} descriptions")
+        return len(captures)
+
+    @classmethod
+    def _scrape_description(
+        cls, url: str, browser: Browser
+    ) -> Tuple[Tag, str, Dict[str, Any]]:
+        """Return the article node, its description and the capture needed to rebuild the description offline."""
+        article = cls._get_article_node(url, browser)
+        recorder = RecordingBrowser(browser)
+        description = cls._create_description(article, recorder)
+        capture = cls.captures.new_capture(
+            url, cls.version, str(article), recorder.pages
+        )
+        return article, description, capture
+
+    @classmethod
+    def _get_entry_metadata(
+        cls, entry: feedparser.util.FeedParserDict
+    ) -> Dict[str, Any]:
+        """Columns shared by every cache, used to serve the entry and to detect when it changes upstream."""
+        return {
+            "published": cls._get_published(entry),
+            "updated": cls._get_updated(entry),
+            "content_hash": cls._get_content_hash(entry),
+            "refreshed": int(time()),
+            "version": cls.version,
+        }
+
+    @classmethod
+    def _get_updated(cls, entry: feedparser.util.FeedParserDict) -> int:
+        if entry.get("updated_parsed"):
+            return calendar.timegm(entry["updated_parsed"])
+        return cls._get_published(entry)
+
+    @staticmethod
+    def _get_content_hash(entry: feedparser.util.FeedParserDict) -> str:
+        content = [entry.get("title", ""), entry.get("summary", "")]
+        content += [c.get("value", "") for c in entry.get("content", [])]
+        return hashlib.sha1("\0".join(content).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _get_published(entry: feedparser.util.FeedParserDict) -> int:
+        """Return the entry publishing date as a UTC epoch, using the struct already parsed by feedparser."""
+        return calendar.timegm(entry["published_parsed"])
+
+    @staticmethod
+    def _epoch_to_datetime(epoch: int) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(int(epoch), tz=datetime.timezone.utc)
+
     @staticmethod
     def _get_broken_item(url: str, title: str, error: str) -> Item:
         return Item(
@@ -106,5 +338,20 @@ class Parser(ABC):
         )
 
 
+def parse_feed(url: str) -> feedparser.util.FeedParserDict:
+    """Download and parse a feed, going through the scheduler."""
+    with scheduler.request(url) as request:
+        feed = feedparser.parse(url)
+        request.status = feed.get("status")
+    return feed
+
+
+def _render_capture(parser: Type[Parser], capture: Dict[str, str]) -> str:
+    """Rebuild a description from its capture, run in a worker process by Parser.rerender."""
+    article, embeds = parser.captures.load_capture(capture)
+    article_node = BeautifulSoup(article, "html.parser").find()
+    return parser._create_description(article_node, ReplayBrowser(embeds))
+
+
 class SkipEntryException(Exception):
     """Signal that this entry should be skipped."""
@@ -1,68 +1,45 @@
-import sqlite3
-from typing import Optional, Dict
+from typing import Any, Optional, Dict, Tuple
 
 from rfeed import Item, Guid
 from feedparser.util import FeedParserDict
-from dateutil import parser, tz
 from bs4 import BeautifulSoup
 from bs4.element import Tag
 
 from rss_parser.cache import Cache
-from rss_parser.logger import cache_log
+from rss_parser.cache.captures import CaptureCache
 from rss_parser.parser import Parser, SkipEntryException
 from rss_parser.helpers import parse_telegram_iframe
+from rss_parser.helpers.transform import Transformer
 from rss_parser.selenium import Browser
 from rss_parser.utils import wait_for
 
 
 class IlPostCache(Cache):
-    @staticmethod
-    def init() -> None:
-        connection = sqlite3.connect(Cache.DB)
-        cursor = connection.cursor()
-        cursor.execute(
-            """ SELECT count(name) FROM sqlite_master WHERE type='table' AND name='ilpost' """
-        )
-        if cursor.fetchone()[0] == 0:
-            cache_log("ilpost: preparing cache...")
-            cursor.execute(
-                """CREATE TABLE ilpost
-                           (id text primary key, title text, published timestamp, description text)"""
-            )
-            connection.commit()
-        cache_log("ilpost: cache ready.")
-        connection.close()
 
-    @classmethod
-    def save_to_cache(
-        cls, url: str, title: str, published: str, description: str
-    ) -> None:
-        cls._save_to_cache("ilpost", (url, title, published, description))
-
-    @classmethod
-    def recover_from_cache(cls, id_: str) -> Optional[Dict[str, str]]:
-        return cls._recover_from_cache(id_, "ilpost")
+    table: str = "ilpost"
+    columns: Dict[str, str] = {
+        "id": "text primary key",
+        "title": "text",
+        "published": "integer",
+        "description": "text",
+        "updated": "integer",
+        "content_hash": "text",
+        "refreshed": "integer",
+        "version": "integer",
+    }
+    max_entries: int = 100
 
     @staticmethod
-    def prune(max_entries: int = 100) -> None:
-        """Keeps in cache only the most recent 60 entries."""
-        connection = sqlite3.connect(Cache.DB)
-        count = connection.execute("""SELECT count(id) FROM ilpost""").fetchone()[0]
-        to_prune = count - max_entries
-        if to_prune > 0:
-            connection.execute(
-                """
-            DELETE FROM ilpost WHERE ilpost.id in
-            (SELECT id FROM ilpost ORDER BY published ASC limit '%s')
-            """
-                % to_prune
-            )
-            connection.commit()
-            cache_log(f"ilpost: pruned {to_prune} old entries.")
+    def new_row(
+        url: str, title: str, description: str, metadata: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        return {"id": url, "title": title, "description": description, **metadata}
 
-    @classmethod
-    def flush_cache(cls):
-        cls._truncate_table("ilpost")
+
+class IlPostCaptures(CaptureCache):
+
+    table: str = "ilpost_captures"
+    max_entries: int = IlPostCache.max_entries
 
 
 class IlPostParser(Parser):
@@ -71,6 +48,9 @@ class IlPostParser(Parser):
     url: str = "https://www.ilpost.it/feed/"
     default_limit: int = 10
     cache: Cache = IlPostCache
+    captures: CaptureCache = IlPostCaptures
+    # articles and live blogs keep being updated after being published
+    refresh_ttl: int = 3600
 
     @classmethod
     def parse_source(cls, url: str, browser: Browser) -> str:
@@ -78,46 +58,46 @@ class IlPostParser(Parser):
         return cls._create_description(article, browser)
 
     @classmethod
-    def parse_entry(cls, entry: FeedParserDict, browser: Browser) -> Item:
-
-        # Check if it should be skipped
-        for tag in entry["tags"]:
-            if tag["term"] == "Abbonati":
-                raise SkipEntryException
+    def parse_entry(
+        cls,
+        entry: FeedParserDict,
+        browser: Browser,
+        cached_item: Optional[Dict[str, str]] = None,
+    ) -> Item:
+        if cls.skip_entry(entry):
+            raise SkipEntryException
 
         link = entry["link"]
-        title = entry["title"]
 
-        item = cls.cache.recover_from_cache(link)
+        item = cached_item or cls.cache.recover_from_cache(link)
 
         if not item:
-            #
             # No cached entry, we need to parse it
-            #
-            article = cls._get_article_node(link, browser)
-
-            description = cls._create_description(article, browser)
-
-            tz_dict = {
-                "EST": tz.gettz("America/New_York"),
-                "EDT": tz.gettz("America/New_York"),
-            }
-            published = parser.parse(entry["published"], tzinfos=tz_dict)
-
-            # Save the parsed data to the cache
-            cls.cache.save_to_cache(link, title, published, description)
-        else:
-            published = parser.parse(item["published"])
-            description = item["description"]
+            item = cls.scrape_entry(entry, browser)
 
         return Item(
-            title=title,
+            title=entry["title"],
             link=link,
-            description=description,
+            description=item["description"],
             guid=Guid(link),
-            pubDate=published,
+            pubDate=cls._epoch_to_datetime(item["published"]),
         )
 
+    @classmethod
+    def skip_entry(cls, entry: FeedParserDict) -> bool:
+        # subscribers only articles
+        return any(tag["term"] == "Abbonati" for tag in entry.get("tags", []))
+
+    @classmethod
+    def scrape(
+        cls, entry: FeedParserDict, browser: Browser
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        article, description, capture = cls._scrape_description(entry["link"], browser)
+        row = cls.cache.new_row(
+            entry["link"], entry["title"], description, cls._get_entry_metadata(entry)
+        )
+        return row, capture
+
     @classmethod
     def _get_article_node(cls, url: str, browser: Browser) -> Tag:
         browser.open(url)
@@ -129,28 +109,17 @@ class IlPostParser(Parser):
 
     @classmethod
     def _create_description(cls, article: Tag, browser: Browser) -> str:
-        description = ""
+        parts = []
 
         # Find out if a subtitle is present
         subtitle = article.find("div", class_="sottit")
         if subtitle:
-            description += str(subtitle)
+            parts.append(str(subtitle))
 
         # initial figure
         header = article.find("div", class_="entry-container")
         if header:
-            for child in header.children:
-                if (
-                    child.name == "div"
-                    and "figure-container" in child.attrs["class"]
-                    and "cf" in child.attrs["class"]
-                ):
-                    first_img = child.find("img")
-                    if first_img:
-                        caption = child.find("span", class_="caption")
-                        description += cls._new_image_with_caption(
-                            first_img.attrs["data-src"], caption.text
-                        )
+            parts.append(header_rules.transform(header.children, browser))
 
         # article body
         body = article.find("div", id="singleBody")
@@ -158,68 +127,12 @@ class IlPostParser(Parser):
             body = article.find("span", id="singleBody")
 
         if body:
-            for child in body.children:
-                # text paragraph
-                if child.name == "p":
-                    # look for a telegram iframe
-                    iframe = child.find("iframe")
-                    if iframe:
-                        if "telegram-post" in iframe.attrs.get("id", ""):
-                            description += parse_telegram_iframe(iframe, browser)
-                        else:
-                            description += cls._new_generic_iframe(iframe)
-                    else:
-                        # normale text paragraph
-                        description += str(child)
-                # simple image
-                if child.name == "img":
-                    description += cls._new_image_with_caption(child.attrs["src"])
-                # attachments
-                if child.name == "div" and "attachment" in child.attrs.get("id", ""):
-                    # images
-                    img = child.find("img")
-                    if img:
-                        description += cls._new_image_with_caption(
-                            img.attrs["data-src"], child.text
-                        )
-                # blockquote
-                if child.name == "blockquote":
-                    description += str(child)
-                # video player
-                if child.name == "div" and "video-container" in child.attrs.get(
-                    "class", []
-                ):
-                    yt = child.find("div", class_="rll-youtube-player")
-                    if yt:
-                        src = yt.attrs["data-src"]
-                        description += cls._new_video_placeholder(src)
-                # image gallery
-                if child.name == "div" and "gallery" in child.attrs.get("class", []):
-                    for inner_child in child.children:
-                        url = inner_child.find("a").attrs["href"]
-                        src = inner_child.find("img").attrs["data-src"]
-                        description += cls._new_gallery_image(url, src)
-                    description += f"<figure><figcaption><a href='{url}' target='_blank'>[GALLERY]</a></figcaption></figure>"
-                # live feed
-                if child.name == "div" and "live-center-embed" in child.attrs.get(
-                    "class", []
-                ):
-                    description += f"<p><a href='{child.attrs['data-src']}'>[[ LIVE BLOG - Click to open a tidy version ]]</a></p>"
-                # data (maps)
-                if child.name == "div" and "ilpost_datawrapper" in child.attrs.get(
-                    "class", []
-                ):
-                    description += cls._new_data_wrapper(child)
-                # data (graphs)
-                if child.name == "div" and "flourish-embed" in child.attrs.get(
-                    "class", []
-                ):
-                    description += "<p><figure><figcaption>[[ DATA GRAPH - Open the webpage to see it ]]</figcaption></figure></p>"
+            parts.append(body_rules.transform(body.children, browser))
 
         # DEBUG - APPEND THE WHOLE UNPROCESSED ARTICLE
-        # description += f"<hr>{str(article)}"
+        # parts.append(f"<hr>{str(article)}")
 
-        return description
+        return "".join(parts)
 
     @staticmethod
     def _new_image_with_caption(url: str, caption: str = None) -> str:
@@ -280,3 +193,86 @@ class IlPostParser(Parser):
             )
         except Exception as e:
             return "<p><figure><figcaption>[[ BROKEN DATA VISUALIZATION - Open the full page to see it ]]</figcaption></figure>"
+
+
+header_rules = Transformer()
+
+
+@header_rules.rule("div", classes=("figure-container", "cf"))
+def _header_figure(child: Tag, browser: Browser) -> Optional[str]:
+    first_img = child.find("img")
+    if first_img:
+        caption = child.find("span", class_="caption")
+        return IlPostParser._new_image_with_caption(
+            first_img.attrs["data-src"], caption.text
+        )
+
+
+body_rules = Transformer()
+
+
+@body_rules.rule("p")
+def _paragraph(child: Tag, browser: Browser) -> str:
+    # look for a telegram iframe
+    iframe = child.find("iframe")
+    if iframe:
+        if "telegram-post" in iframe.attrs.get("id", ""):
+            return parse_telegram_iframe(iframe, browser)
+        return IlPostParser._new_generic_iframe(iframe)
+    # normale text paragraph
+    return str(child)
+
+
+@body_rules.rule("img")
+def _image(child: Tag, browser: Browser) -> str:
+    return IlPostParser._new_image_with_caption(child.attrs["src"])
+
+
+@body_rules.rule("div", id_="attachment")
+def _attachment(child: Tag, browser: Browser) -> Optional[str]:
+    # images
+    img = child.find("img")
+    if img:
+        return IlPostParser._new_image_with_caption(img.attrs["data-src"], child.text)
+
+
+@body_rules.rule("blockquote")
+def _blockquote(child: Tag, browser: Browser) -> str:
+    return str(child)
+
+
+@body_rules.rule("div", classes=("video-container",))
+def _video_player(child: Tag, browser: Browser) -> Optional[str]:
+    yt = child.find("div", class_="rll-youtube-player")
+    if yt:
+        return IlPostParser._new_video_placeholder(yt.attrs["data-src"])
+
+
+@body_rules.rule("div", classes=("gallery",))
+def _gallery(child: Tag, browser: Browser) -> Optional[str]:
+    parts = []
+    url = None
+    for inner_child in child.find_all(recursive=False):
+        url = inner_child.find("a").attrs["href"]
+        src = inner_child.find("img").attrs["data-src"]
+        parts.append(IlPostParser._new_gallery_image(url, src))
+    if url:
+        parts.append(
+            f"<figure><figcaption><a href='{url}' target='_blank'>[GALLERY]</a></figcaption></figure>"
+        )
+    return "".join(parts)
+
+
+@body_rules.rule("div", classes=("live-center-embed",))
+def _live_feed(child: Tag, browser: Browser) -> str:
+    return f"<p><a href='{child.attrs['data-src']}'>[[ LIVE BLOG - Click to open a tidy version ]]</a></p>"
+
+
+@body_rules.rule("div", classes=("ilpost_datawrapper",))
+def _data_map(child: Tag, browser: Browser) -> str:
+    return IlPostParser._new_data_wrapper(child)
+
+
+@body_rules.rule("div", classes=("flourish-embed",))
+def _data_graph(child: Tag, browser: Browser) -> str:
+    return "<p><figure><figcaption>[[ DATA GRAPH - Open the webpage to see it ]]</figcaption></figure></p>"
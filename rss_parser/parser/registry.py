@@ -0,0 +1,78 @@
+import importlib
+from importlib.metadata import entry_points
+from threading import Lock
+from typing import Dict, List, Optional, Type
+
+from rss_parser import config
+from rss_parser.logger import parser_log
+from rss_parser.parser import Parser
+
+ENTRY_POINT_GROUP = "rss_parser.parsers"
+
+# Used when the package metadata is not available, e.g. when running from a plain checkout
+BUILTIN_PARSERS = {
+    "ilpost": "rss_parser.parser.ilpost:IlPostParser",
+    "nasa_iotd": "rss_parser.parser.nasa_iotd:NasaIOTDParser",
+}
+
+
+class ParserRegistry:
+    """Maps feed names to parsers.
+
+    Only the 'module:Class' spec of every parser is known upfront: its module is imported and its cache initialised
+    the first time the feed is requested."""
+
+    def __init__(self, specs: Dict[str, str]):
+        self.specs = specs
+        self._loaded: Dict[str, Type[Parser]] = {}
+        self._lock = Lock()
+
+    @classmethod
+    def from_config(cls) -> "ParserRegistry":
+        """Discover parsers from the builtins, the entry points and config.EXTRA_PARSERS, then keep only
+        config.ENABLED_FEEDS (if set)."""
+        specs = dict(BUILTIN_PARSERS)
+        specs.update(_discover_entry_points())
+        specs.update(config.EXTRA_PARSERS)
+        if config.ENABLED_FEEDS:
+            unknown = set(config.ENABLED_FEEDS) - set(specs)
+            if unknown:
+                parser_log(f"unknown feeds can't be enabled: {', '.join(unknown)}")
+            specs = {k: v for k, v in specs.items() if k in config.ENABLED_FEEDS}
+        return cls(specs)
+
+    def names(self) -> List[str]:
+        return list(self.specs)
+
+    def get(self, name: str) -> Optional[Type[Parser]]:
+        """Return the parser registered as name, loading it if needed, or None if there's no such feed."""
+        parser = self._loaded.get(name)
+        if parser is not None:
+            return parser
+        if name not in self.specs:
+            return None
+        with self._lock:
+            # another thread could have loaded it in the meantime
+            if name not in self._loaded:
+                self._loaded[name] = self._load(name)
+        return self._loaded[name]
+
+    def _load(self, name: str) -> Type[Parser]:
+        module_name, class_name = self.specs[name].split(":")
+        parser = getattr(importlib.import_module(module_name), class_name)
+        if name in config.FEED_URLS:
+            parser.url = config.FEED_URLS[name]
+        parser.cache.init()
+        parser.captures.init()
+        parser_log(f"loaded: {name}")
+        return parser
+
+
+def _discover_entry_points() -> Dict[str, str]:
+    eps = entry_points()
+    if hasattr(eps, "select"):
+        group = eps.select(group=ENTRY_POINT_GROUP)
+    else:
+        # python < 3.10
+        group = eps.get(ENTRY_POINT_GROUP, [])
+    return {ep.name: ep.value for ep in group}
@@ -0,0 +1,146 @@
+from contextlib import contextmanager
+from threading import Condition, Lock
+from time import monotonic
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+from rss_parser import config
+from rss_parser.logger import scheduler_log
+
+
+class Request:
+    """Handed out by Scheduler.request, set status (and retry_after) when known to let the scheduler adapt."""
+
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+
+
+class DomainLimiter:
+    """Token bucket plus a concurrency limit for a single domain.
+
+    The rate adapts: it halves on 429/503 (pausing the domain for Retry-After, if given) and shrinks on slow
+    responses or errors, then slowly climbs back to the configured rate while responses are fine."""
+
+    def __init__(self, concurrency: int, rate: float):
+        self.concurrency = concurrency
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = max(1.0, float(concurrency))
+        self.tokens = self.burst
+        self.active = 0
+        self.queued = 0
+        self.throttled = 0
+        self.blocked_until = 0.0
+        self._last_refill = monotonic()
+        self._condition = Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            self.queued += 1
+            try:
+                while True:
+                    now = monotonic()
+                    self._refill(now)
+                    if (
+                        self.active < self.concurrency
+                        and self.tokens >= 1
+                        and now >= self.blocked_until
+                    ):
+                        self.tokens -= 1
+                        self.active += 1
+                        return
+                    if self.active < self.concurrency:
+                        # wait for the next token (or the end of the pause)
+                        self._condition.wait(
+                            max(
+                                (1 - self.tokens) / self.rate,
+                                self.blocked_until - now,
+                                0.01,
+                            )
+                        )
+                    else:
+                        # wait for a running request to end
+                        self._condition.wait()
+            finally:
+                self.queued -= 1
+
+    def release(self, elapsed: float, request: Request, failed: bool) -> None:
+        with self._condition:
+            self.active -= 1
+            if request.status in (429, 503):
+                self.throttled += 1
+                self.rate = max(self.rate / 2, config.SCHEDULER_MIN_RATE)
+                self.blocked_until = monotonic() + (
+                    request.retry_after or 1 / self.rate
+                )
+            elif failed or elapsed > config.SCHEDULER_SLOW_RESPONSE:
+                self.rate = max(self.rate * 0.75, config.SCHEDULER_MIN_RATE)
+            else:
+                self.rate = min(self.rate + self.base_rate * 0.05, self.base_rate)
+            self._condition.notify_all()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(
+            self.burst, self.tokens + (now - self._last_refill) * self.rate
+        )
+        self._last_refill = now
+
+    def stats(self) -> Dict[str, float]:
+        with self._condition:
+            return {
+                "queued": self.queued,
+                "active": self.active,
+                "concurrency": self.concurrency,
+                "rate": round(self.rate, 3),
+                "base_rate": self.base_rate,
+                "throttled": self.throttled,
+            }
+
+
+class Scheduler:
+    """Every navigation and http fetch of a scraper goes through here, so that no domain gets hammered.
+
+    Limits are per process: uvicorn workers and other nodes each have their own scheduler."""
+
+    def __init__(self):
+        self.limiters: Dict[str, DomainLimiter] = {}
+        self._lock = Lock()
+
+    def limiter(self, domain: str) -> DomainLimiter:
+        with self._lock:
+            if domain not in self.limiters:
+                concurrency, rate = config.DOMAIN_LIMITS.get(
+                    domain,
+                    (config.SCHEDULER_CONCURRENCY, config.SCHEDULER_RATE),
+                )
+                self.limiters[domain] = DomainLimiter(concurrency, rate)
+            return self.limiters[domain]
+
+    @contextmanager
+    def request(self, url: str) -> Iterator[Request]:
+        domain = urlparse(url).netloc
+        if not domain:
+            # not a remote url, e.g. a feed passed as a string
+            yield Request()
+            return
+        limiter = self.limiter(domain)
+        limiter.acquire()
+        request = Request()
+        start = monotonic()
+        failed = True
+        try:
+            yield request
+            failed = False
+        finally:
+            limiter.release(monotonic() - start, request, failed)
+            if request.status in (429, 503):
+                scheduler_log(f"{domain} is throttling us, slowing down.")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            limiters = dict(self.limiters)
+        return {domain: limiter.stats() for domain, limiter in limiters.items()}
+
+
+scheduler = Scheduler()
@@ -3,37 +3,144 @@ import re
 import requests
 import subprocess
 from pathlib import Path
+from time import monotonic
+from typing import Dict, Optional
 
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.webdriver import WebDriver
 
+from rss_parser import config
 from rss_parser.logger import selenium_log, selenium_error
+from rss_parser.scheduler import scheduler
+from rss_parser.watchdog import kill_processes, process_tree, watchdog
 
 CHROMEDRIVER_PATH = os.getcwd() + "/chromedriver"
 CHROME_BIN_PATH = "/usr/bin/google-chrome-stable"
 
 
 class Browser:
+    """A chrome instance driven by selenium, watched by the watchdog: it gets restarted before a navigation once it
+    grew over config.BROWSER_MAX_RSS or opened config.BROWSER_MAX_NAVIGATIONS pages."""
 
     driver: WebDriver
 
     def __init__(self):
+        self._start()
+
+    def _start(self) -> None:
         opts = Options()
         if os.environ.get("SELENIUM_HEADLESS") == "1":
             opts.add_argument("--headless")
         opts.binary_location = CHROME_BIN_PATH
         chrome_driver = CHROMEDRIVER_PATH
         self.driver = webdriver.Chrome(options=opts, executable_path=chrome_driver)
+        self.pid = self.driver.service.process.pid
+        self.navigations = 0
+        self.rss = 0
+        self.recycle = False
+        self.started = monotonic()
+        watchdog.register(self)
+
+    def driver_pid(self) -> int:
+        """The chromedriver pid, chrome processes are its children."""
+        return self.pid
+
+    def restart(self) -> None:
+        selenium_log(
+            f"Recycling browser {self.driver_pid()} after {self.navigations} pages ({self.rss >> 20} MB)."
+        )
+        self.quit()
+        self._start()
 
     def open(self, url: str) -> None:
-        self.driver.get(url)
+        if self.recycle or self.navigations >= config.BROWSER_MAX_NAVIGATIONS:
+            self.restart()
+        self.navigations += 1
+        with scheduler.request(url):
+            self.driver.get(url)
 
     def get_page_source(self) -> str:
         return self.driver.page_source
 
     def quit(self) -> None:
-        self.driver.quit()
+        watchdog.unregister(self)
+        # chrome may survive chromedriver: kill what's left once it's done
+        processes = process_tree(self.pid)
+        try:
+            self.driver.quit()
+        finally:
+            kill_processes(processes)
+
+
+class HttpBrowser(Browser):
+    """Fetches pages with plain http requests, without running any javascript. Meant to exercise the service
+    without chrome, e.g. against the load test upstream."""
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.source = ""
+
+    def open(self, url: str) -> None:
+        with scheduler.request(url) as request:
+            response = self.session.get(url, timeout=30)
+            request.status = response.status_code
+            if response.headers.get("Retry-After", "").isdigit():
+                request.retry_after = float(response.headers["Retry-After"])
+        self.source = response.text
+
+    def get_page_source(self) -> str:
+        return self.source
+
+    def quit(self) -> None:
+        self.session.close()
+
+
+def new_browser() -> Browser:
+    """Return a browser of the kind selected by config.BROWSER."""
+    if config.BROWSER == "http":
+        return HttpBrowser()
+    return Browser()
+
+
+class RecordingBrowser(Browser):
+    """Wraps a Browser, keeping the last source read from every opened page."""
+
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.pages: Dict[str, str] = {}
+        self.current_url: Optional[str] = None
+
+    def open(self, url: str) -> None:
+        self.browser.open(url)
+        self.current_url = url
+
+    def get_page_source(self) -> str:
+        source = self.browser.get_page_source()
+        self.pages[self.current_url] = source
+        return source
+
+    def quit(self) -> None:
+        self.browser.quit()
+
+
+class ReplayBrowser(Browser):
+    """Serves the pages recorded by a RecordingBrowser, without launching chrome nor touching the network."""
+
+    def __init__(self, pages: Dict[str, str]):
+        self.pages = pages
+        self.current_url: Optional[str] = None
+
+    def open(self, url: str) -> None:
+        if url not in self.pages:
+            raise Exception(f"Page not captured: {url}")
+        self.current_url = url
+
+    def get_page_source(self) -> str:
+        return self.pages[self.current_url]
+
+    def quit(self) -> None:
+        pass
 
 
 def setup_selenium():
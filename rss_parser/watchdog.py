@@ -0,0 +1,163 @@
+import getpass
+import os
+import weakref
+from threading import Lock, Thread
+from time import monotonic, sleep, time
+from typing import Dict, List
+
+import psutil
+
+from rss_parser import config
+from rss_parser.logger import selenium_log
+
+
+class BrowserWatchdog:
+    """Keeps track of the chrome instances started by Browser, so the service memory footprint stays bounded.
+
+    A background thread periodically measures the RSS of every instance (chromedriver and its chrome processes)
+    and flags for recycling the ones above config.BROWSER_MAX_RSS, which Browser restarts before its next
+    navigation. It also kills orphaned chromedriver/chrome processes: the ones left by a Browser that was never
+    quit, and the ones reparented to init after their owner died."""
+
+    def __init__(self):
+        self.browsers: "weakref.WeakValueDictionary[int, object]" = (
+            weakref.WeakValueDictionary()
+        )
+        self._finalizers: Dict[int, weakref.finalize] = {}
+        self._lock = Lock()
+        self._thread = None
+
+    def register(self, browser) -> None:
+        pid = browser.driver_pid()
+        with self._lock:
+            self.browsers[pid] = browser
+            # if the browser is garbage collected without being quit, kill its processes
+            self._finalizers[pid] = weakref.finalize(browser, kill_process_tree, pid)
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True, name="watchdog")
+                self._thread.start()
+
+    def unregister(self, browser) -> None:
+        pid = browser.driver_pid()
+        with self._lock:
+            self.browsers.pop(pid, None)
+            finalizer = self._finalizers.pop(pid, None)
+        if finalizer:
+            finalizer.detach()
+
+    def _run(self) -> None:
+        while True:
+            sleep(config.WATCHDOG_INTERVAL)
+            try:
+                self.sweep()
+            except Exception as e:
+                selenium_log(f"Watchdog sweep failed: {e}")
+
+    def sweep(self) -> None:
+        with self._lock:
+            browsers = dict(self.browsers)
+            for pid in [pid for pid in self._finalizers if pid not in browsers]:
+                del self._finalizers[pid]
+        for browser in browsers.values():
+            browser.rss = process_tree_rss(browser.driver_pid())
+            if browser.rss > config.BROWSER_MAX_RSS:
+                browser.recycle = True
+        self._reap_orphans(set(browsers))
+
+    @staticmethod
+    def _reap_orphans(registered: set) -> None:
+        # leave alone recent processes: a Browser registers only once chrome is up, which takes a while
+        started_before = time() - 3 * config.WATCHDOG_INTERVAL
+        orphans = [
+            child.pid
+            for child in psutil.Process().children()
+            if _is_chromedriver(child)
+            and child.pid not in registered
+            and _started_before(child, started_before)
+        ]
+        # when running as init (e.g. in a container) every chromedriver of ours has ppid 1
+        if os.getpid() != 1:
+            user = getpass.getuser()
+            for process in psutil.process_iter(
+                ["name", "ppid", "cmdline", "username", "create_time"]
+            ):
+                info = process.info
+                if (
+                    info["ppid"] != 1
+                    or info["username"] != user
+                    or process.pid in registered
+                    or (info["create_time"] or 0) > started_before
+                ):
+                    continue
+                cmdline = " ".join(info["cmdline"] or [])
+                if "chromedriver" in (info["name"] or "") or (
+                    "chrome" in (info["name"] or "")
+                    and "--test-type=webdriver" in cmdline
+                ):
+                    orphans.append(process.pid)
+        for pid in orphans:
+            selenium_log(f"Killing orphaned browser process {pid}")
+            kill_process_tree(pid)
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            browsers = list(self.browsers.values())
+        return [
+            {
+                "chromedriver_pid": browser.driver_pid(),
+                "processes": len(process_tree(browser.driver_pid())),
+                "rss_bytes": process_tree_rss(browser.driver_pid()),
+                "navigations": browser.navigations,
+                "age_s": round(monotonic() - browser.started),
+                "recycle": browser.recycle,
+            }
+            for browser in browsers
+        ]
+
+
+def process_tree(pid: int) -> List[psutil.Process]:
+    try:
+        process = psutil.Process(pid)
+        return [process] + process.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return []
+
+
+def process_tree_rss(pid: int) -> int:
+    rss = 0
+    for process in process_tree(pid):
+        try:
+            rss += process.memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return rss
+
+
+def kill_process_tree(pid: int) -> None:
+    kill_processes(process_tree(pid))
+
+
+def kill_processes(processes: List[psutil.Process]) -> None:
+    for process in processes:
+        try:
+            process.kill()
+        except psutil.NoSuchProcess:
+            pass
+    psutil.wait_procs(processes, timeout=5)
+
+
+def _started_before(process: psutil.Process, timestamp: float) -> bool:
+    try:
+        return process.create_time() <= timestamp
+    except psutil.NoSuchProcess:
+        return False
+
+
+def _is_chromedriver(process: psutil.Process) -> bool:
+    try:
+        return "chromedriver" in process.name()
+    except psutil.NoSuchProcess:
+        return False
+
+
+watchdog = BrowserWatchdog()
@@ -26,3 +26,81 @@ def run_xvfb(c):
         c.run("poetry run uvicorn --host 0.0.0.0 rss_parser.api:app")
     finally:
         display.stop()
+
+
+@task
+def rerender(c, feed, force=False):
+    """Rebuild the cached descriptions of a feed from the stored captures, without a browser."""
+    from rss_parser.parser.registry import ParserRegistry
+
+    parser = ParserRegistry.from_config().get(feed)
+    if parser is None:
+        raise Exception(f"Feed not found: {feed}")
+    print(f"{feed}: {parser.rerender(force)} descriptions rerendered")
+
+
+@task
+def bench_transform(c, runs=20):
+    """Time IlPostParser._create_description on large gallery and live blog articles."""
+    from timeit import timeit
+    from bs4 import BeautifulSoup
+    from benchmarks.fixtures import gallery_fixture, live_blog_fixture
+    from rss_parser.parser.ilpost import IlPostParser
+
+    fixtures = {
+        "gallery (500 images)": gallery_fixture(500),
+        "live blog (500 updates)": live_blog_fixture(500),
+    }
+    for name, html in fixtures.items():
+        article = BeautifulSoup(html, "html.parser").find("article")
+        elapsed = timeit(
+            lambda: IlPostParser._create_description(article, None), number=runs
+        )
+        print(f"{name}: {elapsed / runs * 1000:.2f} ms")
+
+
+@task
+def loadtest(
+    c, concurrency="50,100,500", duration=10, entries=20, workers=1, output=None
+):
+    """Measure /parse, /cached and /preview under concurrent pollers, reporting a JSON summary.
+
+    The app runs against a local stand-in upstream, scraping with the plain http browser (set
+    RSS_PARSER_BROWSER=chrome and SELENIUM_HEADLESS=1 to use headless chrome instead)."""
+    import json
+    from benchmarks.loadtest import run
+
+    report = run(
+        [int(level) for level in concurrency.split(",")],
+        duration=float(duration),
+        entries=int(entries),
+        workers=int(workers),
+    )
+    report = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(report)
+    print(report)
+
+
+@task
+def backfill(c, feed, urls="", browsers=2, batch_size=20):
+    """Warm up the cache of a feed (or of the comma separated urls), scraping the missing entries in parallel.
+
+    Urls must still be in the feed, the others are skipped. It can be interrupted and launched again: already
+    cached entries are skipped."""
+    from rss_parser.backfill import backfill as backfill_cache, get_entries
+    from rss_parser.parser.registry import ParserRegistry
+
+    parser = ParserRegistry.from_config().get(feed)
+    if parser is None:
+        raise Exception(f"Feed not found: {feed}")
+    entries = get_entries(parser, [url for url in urls.split(",") if url])
+
+    def progress(done, total, url, error):
+        print(f"[{done}/{total}] {'FAILED' if error else 'ok'} {url}")
+
+    stats = backfill_cache(
+        parser, entries, int(browsers), int(batch_size), progress=progress
+    )
+    print(f"{feed}: {stats}")
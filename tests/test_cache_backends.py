@@ -0,0 +1,309 @@
+import sqlite3
+
+import fakeredis
+import pytest
+
+from rss_parser.cache import set_backend
+from rss_parser.cache.backend import CACHED
+from rss_parser.cache.failures import FailureCache
+from rss_parser.cache.redis_backend import RedisBackend
+from rss_parser.cache.sqlite_backend import SqliteBackend
+
+COLUMNS = {
+    "id": "text primary key",
+    "title": "text",
+    "published": "integer",
+}
+
+
+def row(n: int, published: int = None) -> dict:
+    return {
+        "id": f"https://example.com/{n}",
+        "title": f"title {n}",
+        "published": n if published is None else published,
+    }
+
+
+def ids(rows) -> list:
+    return [element["id"] for element in rows]
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def backend(request, tmp_path, redis_client):
+    if request.param == "sqlite":
+        backend = SqliteBackend(str(tmp_path / "cache.db"))
+    else:
+        backend = RedisBackend("", "test", client=redis_client)
+    backend.init_table("items", COLUMNS, "published")
+    return backend
+
+
+def test_save_and_recover(backend):
+    backend.save("items", row(1))
+    backend.save_many("items", [row(2), row(3)])
+
+    recovered = backend.recover("items", row(2)["id"])
+    assert recovered["title"] == "title 2"
+    assert int(recovered["published"]) == 2
+    assert backend.recover("items", "https://example.com/missing") is None
+
+
+def test_save_replaces_the_row(backend):
+    backend.save("items", row(1))
+    backend.save("items", {**row(1), "title": "new title"})
+
+    assert backend.recover("items", row(1)["id"])["title"] == "new title"
+    assert len(backend.recover_all("items")) == 1
+
+
+def test_recover_many_skips_missing_ids(backend):
+    backend.save_many("items", [row(1), row(2)])
+
+    recovered = backend.recover_many(
+        "items", [row(1)["id"], "https://example.com/missing", row(2)["id"]]
+    )
+    assert set(recovered) == {row(1)["id"], row(2)["id"]}
+    assert backend.recover_many("items", []) == {}
+
+
+def test_recover_all_is_most_recent_first(backend):
+    backend.save_many("items", [row(2), row(3), row(1)])
+
+    assert ids(backend.recover_all("items")) == ids([row(3), row(2), row(1)])
+
+
+def test_prune_keeps_the_most_recent(backend):
+    backend.save_many("items", [row(n) for n in (5, 1, 4, 2, 3)])
+
+    assert backend.prune("items", 3) == 2
+    assert ids(backend.recover_all("items")) == ids([row(5), row(4), row(3)])
+    assert backend.prune("items", 3) == 0
+
+
+def cursor(element) -> tuple:
+    return int(element[CACHED]), element["id"]
+
+
+def test_cached_grows_on_every_save(backend):
+    backend.save_many("items", [row(2), row(1)])
+    backend.save("items", row(3))
+
+    cached = [int(element[CACHED]) for element in backend.recover_all("items")]
+    assert cached[0] > cached[1] and cached[0] > cached[2]
+    assert cached[1] != cached[2]
+
+
+def test_recover_page_follows_saves(backend):
+    backend.save_many("items", [row(1), row(2), row(3)])
+
+    first_page = backend.recover_page("items", 0, None, 2)
+    assert ids(first_page) == ids([row(1), row(2)])
+    second_page = backend.recover_page("items", *cursor(first_page[-1]), 2)
+    assert ids(second_page) == ids([row(3)])
+
+    # saved later, even if published earlier or saved before
+    backend.save_many("items", [row(0), row(1)])
+    next_page = backend.recover_page("items", *cursor(second_page[-1]), 10)
+    assert ids(next_page) == ids([row(0), row(1)])
+    assert backend.recover_page("items", *cursor(next_page[-1]), 10) == []
+
+
+def test_recover_page_after_a_deleted_row(backend):
+    backend.save_many("items", [row(1), row(2), row(3)])
+    page = backend.recover_page("items", 0, None, 2)
+
+    backend.delete("items", ids(page))
+
+    assert ids(backend.recover_page("items", *cursor(page[-1]), 10)) == ids([row(3)])
+
+
+def test_recover_page_since(backend):
+    backend.save_many("items", [row(1), row(2)])
+    first = backend.recover("items", row(1)["id"])
+
+    # without after_id, rows with the same CACHED are skipped
+    page = backend.recover_page("items", int(first[CACHED]), None, 10)
+    assert ids(page) == ids([row(2)])
+    assert backend.recover_page("items", int(page[-1][CACHED]), None, 10) == []
+
+
+def test_delete(backend):
+    backend.save_many("items", [row(1), row(2)])
+
+    backend.delete("items", [row(1)["id"]])
+    backend.delete("items", [])
+
+    assert ids(backend.recover_all("items")) == ids([row(2)])
+
+
+def test_truncate_only_touches_its_table(backend):
+    backend.init_table("items_captures", COLUMNS, "published")
+    backend.save_many("items", [row(1), row(2)])
+    backend.save("items_captures", row(1))
+
+    backend.truncate("items")
+
+    assert backend.recover_all("items") == []
+    assert ids(backend.recover_all("items_captures")) == ids([row(1)])
+
+
+def test_sqlite_migrates_legacy_timestamps(tmp_path):
+    db = str(tmp_path / "cache.db")
+    connection = sqlite3.connect(db)
+    # the schema of older versions
+    connection.execute("CREATE TABLE items (id text primary key, published timestamp)")
+    connection.execute(
+        "INSERT INTO items VALUES (?, ?)", (row(1)["id"], "2022-05-01 10:00:00")
+    )
+    connection.commit()
+    connection.close()
+
+    backend = SqliteBackend(db)
+    backend.init_table("items", COLUMNS, "published")
+
+    migrated = backend.recover("items", row(1)["id"])
+    assert migrated["published"] == 1651399200
+    # the columns added later are there too
+    assert "title" in migrated
+    assert migrated[CACHED] == 1651399200 * 1000000
+    # migrating again is a no-op
+    backend.init_table("items", COLUMNS, "published")
+    assert backend.recover("items", row(1)["id"]) == migrated
+
+
+def test_redis_migrates_legacy_timestamps(redis_client):
+    redis_client.hset(
+        "test:items:https://example.com/1",
+        mapping={"id": row(1)["id"], "published": "2022-05-01 10:00:00"},
+    )
+    redis_client.zadd("test:items", {row(1)["id"]: 0})
+
+    backend = RedisBackend("", "test", client=redis_client)
+    backend.init_table("items", COLUMNS, "published")
+
+    assert backend.recover("items", row(1)["id"])["published"] == "1651399200"
+    assert redis_client.zscore("test:items", row(1)["id"]) == 1651399200
+    assert backend.recover("items", row(1)["id"])[CACHED] == "1651399200000000"
+    backend.init_table("items", COLUMNS, "published")
+    assert backend.recover("items", row(1)["id"])["published"] == "1651399200"
+
+
+def test_redis_truncate_is_scoped_by_prefix(redis_client):
+    backend = RedisBackend("", "test", client=redis_client)
+    other = RedisBackend("", "other", client=redis_client)
+    for cache in (backend, other):
+        cache.init_table("items", COLUMNS, "published")
+        cache.save("items", row(1))
+
+    backend.truncate("items")
+
+    assert backend.recover_all("items") == []
+    assert ids(other.recover_all("items")) == ids([row(1)])
+
+
+def test_redis_ttl(redis_client):
+    backend = RedisBackend("", "test", ttl=60, client=redis_client)
+    backend.init_table("items", COLUMNS, "published")
+    backend.save_many("items", [row(1), row(2), row(3)])
+
+    assert 0 < redis_client.ttl("test:items:https://example.com/1") <= 60
+    # expire a row before its time
+    redis_client.delete("test:items:https://example.com/2")
+
+    assert ids(backend.recover_page("items", 0, None, 2)) == ids([row(1), row(3)])
+    backend._drop_expired("items")
+    assert redis_client.zrange("test:items", 0, -1) == ids([row(1), row(3)])
+    # expired rows don't count when pruning
+    assert backend.prune("items", 2) == 0
+
+
+def test_redis_without_ttl_keeps_rows(redis_client):
+    backend = RedisBackend("", "test", client=redis_client)
+    backend.init_table("items", COLUMNS, "published")
+    backend.save("items", row(1))
+
+    assert redis_client.ttl("test:items:https://example.com/1") == -1
+
+
+@pytest.fixture
+def cache_backend(backend):
+    set_backend(backend)
+    FailureCache.init()
+    yield backend
+    set_backend(None)
+
+
+def test_failure_cache_backoff(cache_backend):
+    first = FailureCache.record("feed", row(1)["id"], "title 1", "error")
+    assert FailureCache.is_backing_off(first)
+
+    second = FailureCache.record(
+        "feed",
+        row(1)["id"],
+        "title 1",
+        "error",
+        FailureCache.recover_from_cache(row(1)["id"]),
+    )
+    assert second["failures"] == 2
+    assert (
+        second["retry_after"] - second["last_failure"] == 2 * FailureCache.base_backoff
+    )
+    assert not FailureCache.is_backing_off(None)
+    assert ids(FailureCache.recover_feed_failures("feed")) == ids([row(1)])
+
+
+def test_cache_prune_defaults_to_max_entries(cache_backend, monkeypatch):
+    monkeypatch.setattr(FailureCache, "max_entries", 2)
+    for n in range(4):
+        FailureCache.save_to_cache(
+            {
+                "id": row(n)["id"],
+                "feed": "feed",
+                "title": "",
+                "error": "",
+                "failures": 1,
+                "last_failure": n,
+                "retry_after": n,
+            }
+        )
+
+    FailureCache.prune()
+
+    assert ids(FailureCache.recover_all_from_cache()) == ids([row(3), row(2)])
+
+
+def test_recover_page_through_migrated_ties(tmp_path):
+    db = str(tmp_path / "cache.db")
+    connection = sqlite3.connect(db)
+    connection.execute("CREATE TABLE items (id text primary key, published timestamp)")
+    connection.executemany(
+        "INSERT INTO items VALUES (?, ?)", [(row(n)["id"], 10) for n in range(3)]
+    )
+    connection.commit()
+    connection.close()
+    backend = SqliteBackend(db)
+    backend.init_table("items", COLUMNS, "published")
+
+    page = backend.recover_page("items", 0, None, 2)
+    assert ids(page) == ids([row(0), row(1)])
+    assert ids(backend.recover_page("items", *cursor(page[-1]), 2)) == ids([row(2)])
+
+
+def test_redis_recover_page_through_migrated_ties(redis_client):
+    for n in range(3):
+        redis_client.hset(
+            f"test:items:{row(n)['id']}", mapping={"id": row(n)["id"], "published": 10}
+        )
+        redis_client.zadd("test:items", {row(n)["id"]: 10})
+    backend = RedisBackend("", "test", client=redis_client)
+    backend.init_table("items", COLUMNS, "published")
+
+    page = backend.recover_page("items", 0, None, 2)
+    assert ids(page) == ids([row(0), row(1)])
+    backend.delete("items", [row(1)["id"]])
+    assert ids(backend.recover_page("items", *cursor(page[-1]), 2)) == ids([row(2)])
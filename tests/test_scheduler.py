@@ -0,0 +1,157 @@
+import pytest
+
+from rss_parser import config, scheduler as scheduler_module
+from rss_parser.scheduler import DomainLimiter, Request, Scheduler
+
+
+class Blocked(Exception):
+    """Raised when a limiter would wait for a running request to end."""
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.waits = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def wait(self, timeout=None) -> bool:
+        # waiting for a token just lets the time go by
+        if timeout is None:
+            raise Blocked()
+        self.waits.append(timeout)
+        self.now += timeout
+        return False
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(scheduler_module, "monotonic", clock)
+    return clock
+
+
+def limiter(clock: Clock, concurrency: int, rate: float) -> DomainLimiter:
+    limiter = DomainLimiter(concurrency, rate)
+    limiter._condition.wait = clock.wait
+    return limiter
+
+
+def fine(limiter: DomainLimiter) -> None:
+    limiter.release(0.1, Request(), False)
+
+
+def throttled(limiter: DomainLimiter, retry_after=None) -> None:
+    request = Request()
+    request.status = 429
+    request.retry_after = retry_after
+    limiter.release(0.1, request, False)
+
+
+def test_burst_up_to_the_concurrency(clock):
+    domain = limiter(clock, concurrency=3, rate=1)
+
+    for _ in range(3):
+        domain.acquire()
+
+    assert clock.waits == []
+    assert domain.stats()["active"] == 3
+
+
+def test_concurrency_cap(clock):
+    domain = limiter(clock, concurrency=1, rate=100)
+    domain.acquire()
+
+    with pytest.raises(Blocked):
+        domain.acquire()
+    assert domain.stats()["queued"] == 0
+
+
+def test_refill_spacing(clock):
+    domain = limiter(clock, concurrency=1, rate=2)
+    start = clock.now
+
+    for _ in range(5):
+        domain.acquire()
+        fine(domain)
+
+    # the first one uses the burst, then one every 1 / rate seconds
+    assert clock.now - start == pytest.approx(4 * 0.5)
+
+
+def test_halves_on_429_and_pauses_for_retry_after(clock):
+    domain = limiter(clock, concurrency=2, rate=2)
+    domain.acquire()
+
+    throttled(domain, retry_after=30)
+
+    assert domain.rate == 1
+    assert domain.stats()["throttled"] == 1
+    paused_at = clock.now
+    domain.acquire()
+    assert clock.now >= paused_at + 30
+
+
+def test_pauses_for_a_token_on_429_without_retry_after(clock):
+    domain = limiter(clock, concurrency=2, rate=2)
+    domain.acquire()
+
+    throttled(domain)
+
+    assert domain.blocked_until == pytest.approx(clock.now + 1 / domain.rate)
+
+
+def test_slow_and_failed_requests_lower_the_rate(clock, monkeypatch):
+    monkeypatch.setattr(config, "SCHEDULER_MIN_RATE", 0.5)
+    domain = limiter(clock, concurrency=1, rate=2)
+
+    domain.acquire()
+    domain.release(config.SCHEDULER_SLOW_RESPONSE + 1, Request(), False)
+    assert domain.rate == pytest.approx(1.5)
+
+    domain.acquire()
+    domain.release(0.1, Request(), True)
+    assert domain.rate == pytest.approx(1.125)
+
+    for _ in range(5):
+        domain.acquire()
+        throttled(domain)
+    assert domain.rate == 0.5
+
+
+def test_slowly_recovers_the_base_rate(clock):
+    domain = limiter(clock, concurrency=1, rate=2)
+    domain.acquire()
+    throttled(domain)
+
+    # 5% of the base rate every request that went fine
+    for expected in (1.1, 1.2, 1.3):
+        domain.acquire()
+        fine(domain)
+        assert domain.rate == pytest.approx(expected)
+    for _ in range(20):
+        domain.acquire()
+        fine(domain)
+    assert domain.rate == 2
+
+
+def test_scheduler_feeds_the_status_back(clock):
+    scheduler = Scheduler()
+
+    with scheduler.request("https://example.com/feed") as request:
+        request.status = 503
+
+    stats = scheduler.stats()["example.com"]
+    assert stats["rate"] == config.SCHEDULER_RATE / 2
+    assert stats["throttled"] == 1
+    assert stats["active"] == 0
+
+
+def test_scheduler_passes_through_what_is_not_an_url(clock):
+    scheduler = Scheduler()
+
+    with scheduler.request("<rss></rss>"):
+        pass
+
+    assert scheduler.stats() == {}
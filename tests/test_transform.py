@@ -0,0 +1,124 @@
+from pathlib import Path
+
+import pytest
+from bs4 import BeautifulSoup
+
+from benchmarks.fixtures import gallery_fixture, live_blog_fixture
+from rss_parser.helpers.transform import Transformer
+from rss_parser.parser.ilpost import IlPostParser
+
+DATA = Path(__file__).parent / "data"
+
+
+def nodes(html: str) -> list:
+    return list(BeautifulSoup(html, "html.parser").contents)
+
+
+@pytest.fixture
+def rules() -> Transformer:
+    rules = Transformer()
+
+    @rules.rule("div", classes=("video", "wide"))
+    def wide_video(node):
+        return "[wide video]"
+
+    @rules.rule("div", classes=("video",))
+    def video(node):
+        return "[video]"
+
+    @rules.rule("div", id_="attachment")
+    def attachment(node):
+        return "[attachment]"
+
+    @rules.rule("div")
+    def div(node):
+        return "[div]"
+
+    @rules.rule("p")
+    def paragraph(node, suffix):
+        return node.text + suffix
+
+    return rules
+
+
+def test_first_registered_rule_wins(rules):
+    # the video rules come before the id and tag ones
+    assert rules.transform(nodes("<div id='attachment_1' class='video'></div>")) == (
+        "[video]"
+    )
+    assert rules.transform(nodes("<div class='wide video'></div>")) == "[wide video]"
+    assert rules.transform(nodes("<div id='attachment_1'></div>")) == "[attachment]"
+
+
+def test_class_matching_needs_every_class(rules):
+    assert rules.transform(nodes("<div class='wide'></div>")) == "[div]"
+    assert rules.transform(nodes("<div class='other video'></div>")) == "[video]"
+
+
+def test_id_matching_is_a_substring(rules):
+    assert rules.transform(nodes("<div id='post-attachment-2'></div>")) == (
+        "[attachment]"
+    )
+    assert rules.transform(nodes("<div id='other'></div>")) == "[div]"
+
+
+def test_transform_skips_strings_and_unmatched_tags(rules):
+    html = "text<!-- comment --><span>ignored</span><p>a</p>\n<p>b</p>"
+    assert rules.transform(nodes(html), "!") == "a!b!"
+
+
+def test_handlers_returning_nothing_add_nothing():
+    rules = Transformer()
+
+    @rules.rule("p")
+    def empty(node):
+        return None
+
+    assert rules.transform(nodes("<p>a</p>")) == ""
+
+
+def test_rules_added_later_are_matched(rules):
+    assert rules.transform(nodes("<span>x</span>")) == ""
+
+    @rules.rule("span")
+    def span(node):
+        return "[span]"
+
+    assert rules.transform(nodes("<span>x</span>")) == "[span]"
+
+
+def test_memo_does_not_grow_with_per_item_classes(rules):
+    html = "".join(
+        f"<div class='video wp-image-{i} attachment-{i}'></div>" for i in range(100)
+    )
+
+    assert rules.transform(nodes(html)) == "[video]" * 100
+    assert len(rules._candidates) == 1
+
+
+@pytest.mark.parametrize(
+    "name, html",
+    [
+        ("ilpost_gallery", gallery_fixture(3)),
+        ("ilpost_live_blog", live_blog_fixture(2)),
+    ],
+)
+def test_ilpost_description_matches_the_old_one(name, html):
+    # created by the description builder that came before the rules
+    expected = (DATA / f"{name}.html").read_text()
+    article = BeautifulSoup(html, "html.parser").find("article")
+
+    assert IlPostParser._create_description(article, None) == expected
+
+
+def test_ilpost_gallery_tolerates_whitespace_and_empty_galleries():
+    # the old builder failed on both
+    html = gallery_fixture(3).replace("</div><div", "</div>\n<div")
+    article = BeautifulSoup(html, "html.parser").find("article")
+    expected = (DATA / "ilpost_gallery.html").read_text()
+
+    assert IlPostParser._create_description(article, None) == expected
+
+    empty = "<article><div id='singleBody'><div class='gallery'></div></div></article>"
+    article = BeautifulSoup(empty, "html.parser").find("article")
+    assert IlPostParser._create_description(article, None) == ""